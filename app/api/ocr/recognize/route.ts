@@ -4,6 +4,7 @@ import { promisify } from "util"
 import * as fs from "fs"
 import * as path from "path"
 import { v4 as uuidv4 } from "uuid"
+import { getRecognizerDaemon, isRecognizerDaemonEnabled } from "@/lib/recognizer-daemon"
 
 const execAsync = promisify(exec)
 
@@ -241,53 +242,77 @@ export async function POST(request: Request) {
       )
     }
 
-    // 生成临时文件名
-    const tempId = uuidv4()
-    const tempDir = path.join(process.cwd(), "temp")
-    const inputPath = path.join(tempDir, `${tempId}_input.jpg`)
-    const scriptPath = path.join(tempDir, `${tempId}_ocr_engine.py`)
+    // 单次识别：常驻进程模式下直接传输图像，否则生成临时脚本并启动 Python
+    let runRecognition: (round: number) => Promise<any>
+    let cleanup = () => {}
+
+    if (isRecognizerDaemonEnabled()) {
+      const imageBuffer = Buffer.from(await image.arrayBuffer())
+      // 未传 use_gpu 时沿用常驻进程启动时的模式（RECOGNIZER_USE_GPU）
+      const daemonRequest = formData.has("use_gpu") ? { op: "ocr" as const, use_gpu: useGpu } : { op: "ocr" as const }
+      runRecognition = async () => {
+        try {
+          return await getRecognizerDaemon().request(daemonRequest, imageBuffer)
+        } catch (e) {
+          return { error: e instanceof Error ? e.message : "未知错误" }
+        }
+      }
+    } else {
+      // 生成临时文件名
+      const tempId = uuidv4()
+      const tempDir = path.join(process.cwd(), "temp")
+      const inputPath = path.join(tempDir, `${tempId}_input.jpg`)
+      const scriptPath = path.join(tempDir, `${tempId}_ocr_engine.py`)
+
+      // 确保临时目录存在
+      if (!fs.existsSync(tempDir)) {
+        fs.mkdirSync(tempDir, { recursive: true })
+      }
 
-    // 确保临时目录存在
-    if (!fs.existsSync(tempDir)) {
-      fs.mkdirSync(tempDir, { recursive: true })
-    }
+      // 保存上传的图像
+      const bytes = await image.arrayBuffer()
+      fs.writeFileSync(inputPath, Buffer.from(bytes))
 
-    // 保存上传的图像
-    const bytes = await image.arrayBuffer()
-    fs.writeFileSync(inputPath, Buffer.from(bytes))
+      // 保存 Python 脚本
+      fs.writeFileSync(scriptPath, OCR_ENGINE_PYTHON_CODE)
 
-    // 保存 Python 脚本
-    fs.writeFileSync(scriptPath, OCR_ENGINE_PYTHON_CODE)
+      const pythonPath = process.env.PYTHON_PATH || "python"
+      const scriptName = path.basename(scriptPath)
+      const inputName = path.basename(inputPath)
 
-    const pythonPath = process.env.PYTHON_PATH || "python"
-    const scriptName = path.basename(scriptPath)
-    const inputName = path.basename(inputPath)
+      runRecognition = async (round: number) => {
+        const { stdout, stderr } = await execAsync(
+          `${pythonPath} "${scriptName}" "${inputName}" ${useGpu}`,
+          { cwd: tempDir }
+        )
 
-    // 如果不使用投票，单次识别
-    if (!useVote) {
-      const { stdout, stderr } = await execAsync(
-        `${pythonPath} "${scriptName}" "${inputName}" ${useGpu}`,
-        { cwd: tempDir }
-      )
+        if (stderr && !stderr.includes("WARNING")) {
+          console.error(`[OCR] Round ${round + 1} Python error:`, stderr)
+        }
 
-      if (stderr && !stderr.includes("WARNING")) {
-        console.error("[OCR] Python error:", stderr)
+        return JSON.parse(stdout.trim())
+      }
+
+      // 清理临时文件
+      cleanup = () => {
+        try {
+          fs.unlinkSync(inputPath)
+          fs.unlinkSync(scriptPath)
+        } catch (e) {
+          console.error("[OCR] Cleanup error:", e)
+        }
       }
+    }
 
-      const ocrResult = JSON.parse(stdout.trim())
+    // 如果不使用投票，单次识别
+    if (!useVote) {
+      const ocrResult = await runRecognition(0)
+      cleanup()
 
       if ("error" in ocrResult) {
         throw new Error(ocrResult.error)
       }
 
-      // 清理临时文件
-      try {
-        fs.unlinkSync(inputPath)
-        fs.unlinkSync(scriptPath)
-      } catch (e) {
-        console.error("[OCR] Cleanup error:", e)
-      }
-
       const processingTime = Date.now() - startTime
 
       return NextResponse.json({
@@ -309,16 +334,7 @@ export async function POST(request: Request) {
     const allResults: Array<{ number_code: string | null; confidence: number }> = []
 
     for (let i = 0; i < voteRounds; i++) {
-      const { stdout, stderr } = await execAsync(
-        `${pythonPath} "${scriptName}" "${inputName}" ${useGpu}`,
-        { cwd: tempDir }
-      )
-
-      if (stderr && !stderr.includes("WARNING")) {
-        console.error(`[OCR] Round ${i + 1} Python error:`, stderr)
-      }
-
-      const ocrResult = JSON.parse(stdout.trim())
+      const ocrResult = await runRecognition(i)
 
       if ("error" in ocrResult) {
         console.error(`[OCR] Round ${i + 1} error:`, ocrResult.error)
@@ -331,13 +347,7 @@ export async function POST(request: Request) {
       })
     }
 
-    // 清理临时文件
-    try {
-      fs.unlinkSync(inputPath)
-      fs.unlinkSync(scriptPath)
-    } catch (e) {
-      console.error("[OCR] Cleanup error:", e)
-    }
+    cleanup()
 
     // 投票选择最佳结果
     const voteResult = voteOCRResults(allResults, voteThreshold)
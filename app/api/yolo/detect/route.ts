@@ -4,6 +4,7 @@ import { promisify } from "util"
 import * as fs from "fs"
 import * as path from "path"
 import { v4 as uuidv4 } from "uuid"
+import { getRecognizerDaemon, isRecognizerDaemonEnabled } from "@/lib/recognizer-daemon"
 
 const execAsync = promisify(exec)
 
@@ -382,55 +383,78 @@ export async function POST(request: Request) {
       )
     }
 
-    // 生成临时文件名
-    const tempId = uuidv4()
-    const tempDir = path.join(process.cwd(), "temp")
-    const inputPath = path.join(tempDir, `${tempId}_input.jpg`)
-    const scriptPath = path.join(tempDir, `${tempId}_yolo_detector.py`)
+    // 单次检测：常驻进程模式下直接传输图像，否则生成临时脚本并启动 Python
+    let runDetection: (round: number) => Promise<any>
+    let cleanup = () => {}
+
+    if (isRecognizerDaemonEnabled()) {
+      const imageBuffer = Buffer.from(await image.arrayBuffer())
+      runDetection = async () => {
+        try {
+          return await getRecognizerDaemon().request({ op: "detect", confidence }, imageBuffer)
+        } catch (e) {
+          return { error: e instanceof Error ? e.message : "未知错误" }
+        }
+      }
+    } else {
+      // 生成临时文件名
+      const tempId = uuidv4()
+      const tempDir = path.join(process.cwd(), "temp")
+      const inputPath = path.join(tempDir, `${tempId}_input.jpg`)
+      const scriptPath = path.join(tempDir, `${tempId}_yolo_detector.py`)
+
+      // 确保临时目录存在
+      if (!fs.existsSync(tempDir)) {
+        fs.mkdirSync(tempDir, { recursive: true })
+      }
 
-    // 确保临时目录存在
-    if (!fs.existsSync(tempDir)) {
-      fs.mkdirSync(tempDir, { recursive: true })
-    }
+      // 保存上传的图像
+      const bytes = await image.arrayBuffer()
+      fs.writeFileSync(inputPath, Buffer.from(bytes))
 
-    // 保存上传的图像
-    const bytes = await image.arrayBuffer()
-    fs.writeFileSync(inputPath, Buffer.from(bytes))
+      // 保存 Python 脚本
+      fs.writeFileSync(scriptPath, YOLO_DETECTOR_PYTHON_CODE)
 
-    // 保存 Python 脚本
-    fs.writeFileSync(scriptPath, YOLO_DETECTOR_PYTHON_CODE)
+      const pythonPath = process.env.PYTHON_PATH || "python"
+      const scriptName = path.basename(scriptPath)
+      const inputName = path.basename(inputPath)
 
-    const pythonPath = process.env.PYTHON_PATH || "python"
-    const scriptName = path.basename(scriptPath)
-    const inputName = path.basename(inputPath)
+      runDetection = async (round: number) => {
+        const { stdout, stderr } = await execAsync(
+          `${pythonPath} "${scriptName}" "${inputName}" ${confidence}`,
+          { cwd: tempDir }
+        )
 
-    // 如果不使用投票，单次检测
-    if (!useVote) {
-      const { stdout, stderr } = await execAsync(
-        `${pythonPath} "${scriptName}" "${inputName}" ${confidence}`,
-        { cwd: tempDir }
-      )
+        if (stderr && !stderr.includes("WARNING") && !stderr.includes("✅")) {
+          console.error(`[YOLO] Round ${round + 1} Python error:`, stderr)
+        } else if (stderr && stderr.includes("✅") && round === 0) {
+          // 只在第一轮显示模型加载信息
+          console.log("[YOLO]", stderr.trim())
+        }
 
-      if (stderr && !stderr.includes("WARNING") && !stderr.includes("✅")) {
-        console.error("[YOLO] Python error:", stderr)
-      } else if (stderr && stderr.includes("✅")) {
-        console.log("[YOLO]", stderr.trim())
+        return JSON.parse(stdout.trim())
       }
 
-      const result = JSON.parse(stdout.trim())
+      // 清理临时文件
+      cleanup = () => {
+        try {
+          fs.unlinkSync(inputPath)
+          fs.unlinkSync(scriptPath)
+        } catch (e) {
+          console.error("[YOLO] Cleanup error:", e)
+        }
+      }
+    }
+
+    // 如果不使用投票，单次检测
+    if (!useVote) {
+      const result = await runDetection(0)
+      cleanup()
 
       if ("error" in result) {
         throw new Error(result.error as string)
       }
 
-      // 清理临时文件
-      try {
-        fs.unlinkSync(inputPath)
-        fs.unlinkSync(scriptPath)
-      } catch (e) {
-        console.error("[YOLO] Cleanup error:", e)
-      }
-
       const processingTime = Date.now() - startTime
 
       return NextResponse.json({
@@ -455,19 +479,7 @@ export async function POST(request: Request) {
     let detectionMethod = "unknown"
 
     for (let i = 0; i < voteRounds; i++) {
-      const { stdout, stderr } = await execAsync(
-        `${pythonPath} "${scriptName}" "${inputName}" ${confidence}`,
-        { cwd: tempDir }
-      )
-
-      if (stderr && !stderr.includes("WARNING") && !stderr.includes("✅")) {
-        console.error(`[YOLO] Round ${i + 1} Python error:`, stderr)
-      } else if (stderr && stderr.includes("✅") && i === 0) {
-        // 只在第一轮显示模型加载信息
-        console.log("[YOLO]", stderr.trim())
-      }
-
-      const result = JSON.parse(stdout.trim())
+      const result = await runDetection(i)
 
       if ("error" in result) {
         console.error(`[YOLO] Round ${i + 1} error:`, result.error)
@@ -481,13 +493,7 @@ export async function POST(request: Request) {
       allDetections.push(result.detections || [])
     }
 
-    // 清理临时文件
-    try {
-      fs.unlinkSync(inputPath)
-      fs.unlinkSync(scriptPath)
-    } catch (e) {
-      console.error("[YOLO] Cleanup error:", e)
-    }
+    cleanup()
 
     // 投票选择最佳结果
     const votedResult = voteDetections(allDetections, voteThreshold)
@@ -0,0 +1,279 @@
+// 常驻 Python 识别进程客户端
+// 模型只在子进程启动时加载一次，之后通过长度前缀帧（4字节大端长度 + 数据）收发请求
+// RECOGNIZER_SHM=true 时图像与结果经 /dev/shm 环形缓冲区交换，管道只传控制消息
+import { spawn, type ChildProcessWithoutNullStreams } from "child_process"
+import * as path from "path"
+import { ShmRing, type ShmFrame } from "./shm-ring"
+
+export type RecognizerOp = "ping" | "detect" | "ocr" | "recognize"
+
+export interface RecognizerRequest {
+  op: RecognizerOp
+  [key: string]: unknown
+}
+
+interface PendingRequest {
+  resolve: (value: any) => void
+  reject: (reason: Error) => void
+  timer: NodeJS.Timeout
+  slot?: number
+}
+
+const REQUEST_TIMEOUT_MS = parseInt(process.env.RECOGNIZER_TIMEOUT_MS || "") || 30000
+const HEALTH_CHECK_INTERVAL_MS = 15000
+const HEALTH_CHECK_TIMEOUT_MS = 5000
+const MAX_RESPAWN_DELAY_MS = 30000
+
+const SHM_ENABLED = process.env.RECOGNIZER_SHM === "true"
+const SHM_SLOTS = parseInt(process.env.RECOGNIZER_SHM_SLOTS || "") || 4
+const SHM_SLOT_SIZE = parseInt(process.env.RECOGNIZER_SHM_SLOT_SIZE || "") || 16 * 1024 * 1024
+
+// 是否启用常驻识别进程（默认沿用每次请求启动脚本的方式）
+export function isRecognizerDaemonEnabled(): boolean {
+  return process.env.RECOGNIZER_DAEMON === "true"
+}
+
+class RecognizerDaemon {
+  private child: ChildProcessWithoutNullStreams | null = null
+  private buffer = Buffer.alloc(0)
+  private pending = new Map<number, PendingRequest>()
+  // 已超时但识别进程可能仍在使用槽位的请求（id → 槽位），迟到的响应到达后释放槽位
+  private abandonedSlots = new Map<number, number>()
+  // 模型加载完成（收到 ready 帧）前不做健康检查，加载可能包含首次下载模型
+  private ready = false
+  // 已发送、尚未收到响应的请求 id（含已超时的请求）；识别进程串行处理，这些请求都排在 ping 之前
+  private outstanding = new Set<number>()
+  // 有在途请求期间最近一次取得进展（开始处理或收到响应）的时间
+  private lastProgressAt = 0
+  private nextId = 1
+  private respawnAttempts = 0
+  private respawnTimer: NodeJS.Timeout | null = null
+  private healthTimer: NodeJS.Timeout | null = null
+  private ring: ShmRing | null = null
+
+  constructor(
+    private pythonPath = process.env.PYTHON_PATH || "python",
+    private scriptPath = path.join(process.cwd(), "new", "recognizer_daemon.py")
+  ) {}
+
+  private start() {
+    const args = [this.scriptPath]
+    if (process.env.RECOGNIZER_USE_GPU === "true") args.push("--use-gpu")
+    if (process.env.RECOGNIZER_ONLY === "true") args.push("--recognizer-only")
+    if (process.env.RECOGNIZER_LEXICON) args.push("--lexicon", process.env.RECOGNIZER_LEXICON)
+    if (process.env.RECOGNIZER_THREADS) args.push("--threads", process.env.RECOGNIZER_THREADS)
+    if (process.env.RECOGNIZER_PRECISION) args.push("--precision", process.env.RECOGNIZER_PRECISION)
+    if (process.env.RECOGNIZER_OCR_BACKEND) args.push("--ocr-backend", process.env.RECOGNIZER_OCR_BACKEND)
+
+    if (SHM_ENABLED) {
+      try {
+        if (!this.ring) {
+          this.ring = new ShmRing(`/dev/shm/recognizer-${process.pid}.ring`, SHM_SLOTS, SHM_SLOT_SIZE)
+          process.once("exit", () => this.ring?.close())
+        }
+        this.ring.reset()
+        this.abandonedSlots.clear()
+        args.push("--shm", this.ring.path)
+      } catch (error) {
+        console.error("[Recognizer] 共享内存缓冲区创建失败，改用管道传输:", error)
+        this.ring = null
+      }
+    }
+
+    this.ready = false
+    this.outstanding.clear()
+
+    const child = spawn(this.pythonPath, args, {
+      cwd: path.dirname(this.scriptPath),
+      stdio: ["pipe", "pipe", "pipe"],
+    })
+    this.child = child
+    this.buffer = Buffer.alloc(0)
+
+    child.stdout.on("data", (chunk: Buffer) => this.onData(chunk))
+    child.stderr.on("data", (chunk: Buffer) => {
+      const text = chunk.toString().trim()
+      if (text) console.log("[Recognizer]", text)
+    })
+    child.stdin.on("error", (error) => {
+      console.error("[Recognizer] Pipe error:", error)
+    })
+    child.on("error", (error) => {
+      console.error("[Recognizer] Spawn error:", error)
+    })
+    child.on("exit", (code, signal) => {
+      if (this.child !== child) return
+      console.error(`[Recognizer] Process exited (code: ${code}, signal: ${signal})`)
+      this.child = null
+      this.failPending(new Error("识别进程已退出"))
+      this.scheduleRespawn()
+    })
+
+    if (!this.healthTimer) {
+      this.healthTimer = setInterval(() => this.healthCheck(), HEALTH_CHECK_INTERVAL_MS)
+      this.healthTimer.unref()
+    }
+  }
+
+  private scheduleRespawn() {
+    if (this.respawnTimer) return
+    const delay = Math.min(MAX_RESPAWN_DELAY_MS, 500 * 2 ** this.respawnAttempts)
+    this.respawnAttempts++
+    this.respawnTimer = setTimeout(() => {
+      this.respawnTimer = null
+      this.ensureStarted()
+    }, delay)
+    this.respawnTimer.unref()
+  }
+
+  private ensureStarted() {
+    if (!this.child) this.start()
+  }
+
+  private async healthCheck() {
+    if (!this.child || !this.ready) return
+
+    // ping 会排在在途推理之后：有在途请求时只要识别进程在请求超时内仍有响应即视为正常
+    if (this.outstanding.size > 0) {
+      if (Date.now() - this.lastProgressAt > REQUEST_TIMEOUT_MS) {
+        console.error(`[Recognizer] No response within ${REQUEST_TIMEOUT_MS}ms, restarting`)
+        this.child.kill()
+      }
+      return
+    }
+
+    try {
+      await this.request({ op: "ping" }, undefined, HEALTH_CHECK_TIMEOUT_MS)
+      this.respawnAttempts = 0
+    } catch (error) {
+      console.error("[Recognizer] Health check failed, restarting:", error)
+      this.child?.kill()
+    }
+  }
+
+  private onData(chunk: Buffer) {
+    this.buffer = Buffer.concat([this.buffer, chunk])
+
+    while (this.buffer.length >= 4) {
+      const length = this.buffer.readUInt32BE(0)
+      if (this.buffer.length < 4 + length) break
+
+      const body = this.buffer.subarray(4, 4 + length)
+      this.buffer = this.buffer.subarray(4 + length)
+
+      let response: any
+      try {
+        response = JSON.parse(body.toString("utf-8"))
+      } catch (error) {
+        console.error("[Recognizer] Invalid response frame:", error)
+        continue
+      }
+
+      if (response.type === "ready") {
+        // 模型加载完成，此后开始健康检查；启动成功即重置重启退避
+        this.ready = true
+        this.respawnAttempts = 0
+        this.lastProgressAt = Date.now()
+        console.log(`[Recognizer] Ready (pid: ${response.pid}, load time: ${Number(response.load_time).toFixed(2)}s)`)
+        continue
+      }
+
+      this.outstanding.delete(response.id)
+      this.lastProgressAt = Date.now()
+
+      const pending = this.pending.get(response.id)
+      if (!pending) {
+        const slot = this.abandonedSlots.get(response.id)
+        if (slot !== undefined) {
+          this.abandonedSlots.delete(response.id)
+          this.ring?.release(slot)
+        }
+        continue
+      }
+      this.pending.delete(response.id)
+      clearTimeout(pending.timer)
+
+      if (pending.slot !== undefined && this.ring && "shm_slot" in response) {
+        // 结果在共享内存槽位中，响应帧只带长度
+        try {
+          response = { ...JSON.parse(this.ring.readResult(pending.slot, response.result_len).toString("utf-8")), id: response.id }
+        } catch (error) {
+          response = { error: `共享内存结果读取失败: ${error}` }
+        }
+      }
+      if (pending.slot !== undefined) this.ring?.release(pending.slot)
+
+      if ("error" in response) {
+        pending.reject(new Error(response.error))
+      } else {
+        pending.resolve(response)
+      }
+    }
+  }
+
+  private failPending(error: Error) {
+    for (const pending of this.pending.values()) {
+      clearTimeout(pending.timer)
+      pending.reject(error)
+    }
+    this.pending.clear()
+  }
+
+  private writeFrame(data: Buffer) {
+    const header = Buffer.alloc(4)
+    header.writeUInt32BE(data.length, 0)
+    this.child!.stdin.write(header)
+    this.child!.stdin.write(data)
+  }
+
+  // 发送请求；detect/ocr/recognize 需附带图像数据（编码图像，或带尺寸与格式的原始像素帧）
+  request<T = any>(req: RecognizerRequest, image?: Buffer | ShmFrame, timeoutMs = REQUEST_TIMEOUT_MS): Promise<T> {
+    this.ensureStarted()
+    if (!this.child) {
+      return Promise.reject(new Error("识别进程不可用"))
+    }
+
+    const id = this.nextId++
+    const frame: ShmFrame = Buffer.isBuffer(image) ? { data: image } : image ?? { data: Buffer.alloc(0) }
+
+    // 有空闲槽位时图像写入共享内存，否则退回管道（原始像素帧只能走共享内存）
+    const slot = req.op !== "ping" && this.ring ? this.ring.acquire(frame.data.length) : null
+    if (slot === null && frame.format) {
+      return Promise.reject(new Error("原始像素帧需要可用的共享内存槽位"))
+    }
+
+    return new Promise<T>((resolve, reject) => {
+      const timer = setTimeout(() => {
+        // 超时的槽位可能仍在被识别进程使用，等迟到的响应到达（或进程重启）后再复用
+        this.pending.delete(id)
+        if (slot !== null) this.abandonedSlots.set(id, slot)
+        reject(new Error(`识别请求超时 (${timeoutMs}ms)`))
+      }, timeoutMs)
+
+      this.pending.set(id, { resolve, reject, timer, slot: slot ?? undefined })
+      if (this.outstanding.size === 0) this.lastProgressAt = Date.now()
+      this.outstanding.add(id)
+
+      // 每个请求固定为 请求头帧 + 数据帧（ping 与共享内存请求的数据帧为空）
+      if (slot !== null) {
+        this.ring!.writeRequest(slot, frame)
+        this.writeFrame(Buffer.from(JSON.stringify({ ...req, id, shm_slot: slot }), "utf-8"))
+        this.writeFrame(Buffer.alloc(0))
+        return
+      }
+
+      this.writeFrame(Buffer.from(JSON.stringify({ ...req, id }), "utf-8"))
+      this.writeFrame(req.op === "ping" ? Buffer.alloc(0) : frame.data)
+    })
+  }
+}
+
+// 开发模式下热更新会重新加载模块，挂在 globalThis 上避免重复启动子进程
+const globalForRecognizer = globalThis as unknown as { recognizerDaemon?: RecognizerDaemon }
+
+export function getRecognizerDaemon(): RecognizerDaemon {
+  if (!globalForRecognizer.recognizerDaemon) {
+    globalForRecognizer.recognizerDaemon = new RecognizerDaemon()
+  }
+  return globalForRecognizer.recognizerDaemon
+}
@@ -0,0 +1,104 @@
+// /dev/shm 共享内存帧环形缓冲区（布局与 new/shm_ring.py 一致）
+// 图像与识别结果写入 tmpfs 文件中的固定槽位，不经过管道也不落盘
+import * as fs from "fs"
+
+const MAGIC = "OCRRING1"
+const VERSION = 1
+const RING_HEADER_SIZE = 64
+const SLOT_HEADER_SIZE = 32
+
+// 槽位状态
+const SLOT_FREE = 0
+const SLOT_REQUEST = 1
+const SLOT_DONE = 2
+
+// 图像格式
+export const FORMAT_ENCODED = 0
+export const FORMAT_RAW_BGR = 1
+export const FORMAT_RAW_GRAY = 2
+
+export interface ShmFrame {
+  data: Buffer
+  format?: number
+  width?: number
+  height?: number
+  channels?: number
+}
+
+export class ShmRing {
+  private fd: number
+  private free: number[]
+
+  constructor(
+    readonly path: string,
+    readonly slotCount = 4,
+    readonly slotSize = 16 * 1024 * 1024
+  ) {
+    this.fd = fs.openSync(path, "w+", 0o600)
+    fs.ftruncateSync(this.fd, RING_HEADER_SIZE + slotCount * (SLOT_HEADER_SIZE + slotSize))
+
+    const header = Buffer.alloc(RING_HEADER_SIZE)
+    header.write(MAGIC, 0, "ascii")
+    header.writeUInt32LE(VERSION, 8)
+    header.writeUInt32LE(slotCount, 12)
+    header.writeUInt32LE(slotSize, 16)
+    fs.writeSync(this.fd, header, 0, header.length, 0)
+
+    this.free = Array.from({ length: slotCount }, (_, i) => i)
+  }
+
+  private slotOffset(slot: number): number {
+    return RING_HEADER_SIZE + slot * (SLOT_HEADER_SIZE + this.slotSize)
+  }
+
+  // 申请空闲槽位，全部占用或数据超出容量时返回 null（调用方改走管道）
+  acquire(size: number): number | null {
+    if (size > this.slotSize) return null
+    return this.free.pop() ?? null
+  }
+
+  release(slot: number) {
+    if (!this.free.includes(slot)) this.free.push(slot)
+  }
+
+  // 识别进程重启后所有槽位都可重新使用
+  reset() {
+    this.free = Array.from({ length: this.slotCount }, (_, i) => i)
+  }
+
+  writeRequest(slot: number, frame: ShmFrame) {
+    const offset = this.slotOffset(slot)
+    fs.writeSync(this.fd, frame.data, 0, frame.data.length, offset + SLOT_HEADER_SIZE)
+
+    const header = Buffer.alloc(SLOT_HEADER_SIZE)
+    header.writeUInt32LE(SLOT_REQUEST, 0)
+    header.writeUInt32LE(frame.format ?? FORMAT_ENCODED, 4)
+    header.writeUInt32LE(frame.width ?? 0, 8)
+    header.writeUInt32LE(frame.height ?? 0, 12)
+    header.writeUInt32LE(frame.channels ?? 0, 16)
+    header.writeUInt32LE(frame.data.length, 20)
+    fs.writeSync(this.fd, header, 0, header.length, offset)
+  }
+
+  readResult(slot: number, length: number): Buffer {
+    const offset = this.slotOffset(slot)
+    const header = Buffer.alloc(SLOT_HEADER_SIZE)
+    fs.readSync(this.fd, header, 0, header.length, offset)
+    if (header.readUInt32LE(0) !== SLOT_DONE) {
+      throw new Error(`槽位 ${slot} 没有结果`)
+    }
+
+    const result = Buffer.alloc(length)
+    fs.readSync(this.fd, result, 0, length, offset + SLOT_HEADER_SIZE)
+
+    header.fill(0)
+    header.writeUInt32LE(SLOT_FREE, 0)
+    fs.writeSync(this.fd, header, 0, 4, offset)
+    return result
+  }
+
+  close() {
+    fs.closeSync(this.fd)
+    fs.rmSync(this.path, { force: true })
+  }
+}
@@ -0,0 +1,317 @@
+"""
+识别流水线基准测试
+
+使用确定性生成的白底黑字标签图（VGA ~ 1200万像素，带杂物与噪声），
+测量检测器、预处理器、OCR引擎、投票确认器及完整流水线的吞吐与延迟分位数。
+
+用法:
+    python benchmark.py --save-baseline                   # 将本次结果保存为基线（在用于门控的主机上生成）
+    python benchmark.py                                   # 与基线对比，退化超出容差或基线缺失时返回非零
+    python benchmark.py --baseline benchmark_baseline.json --tolerance 0.25
+    python benchmark.py --no-gate                         # 只测量并写入 benchmark_results.json
+
+测量期间日志级别提高到 WARNING（投票确认器每次确认都会记录 INFO），日志 I/O 不计入耗时。
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import cv2
+from loguru import logger
+
+from detector import NumberDetector
+from preprocessor import ImagePreprocessor
+from ocr_engine import OCREngine
+from vote_confirmer import VoteConfirmer
+
+RESOLUTIONS: Dict[str, Tuple[int, int]] = {
+    "vga": (640, 480),
+    "hd": (1280, 720),
+    "fhd": (1920, 1080),
+    "5mp": (2592, 1944),
+    "12mp": (4000, 3000),
+}
+
+DEFAULT_BASELINE = Path(__file__).parent / "benchmark_baseline.json"
+
+
+def generate_tag_image(
+    width: int,
+    height: int,
+    code: str = "001",
+    seed: int = 0,
+    clutter: int = 30,
+    noise: float = 6.0
+) -> Tuple[np.ndarray, List[int]]:
+    """
+    生成一张带数字标签的合成图像
+
+    Returns:
+        (BGR图像, 标签真实框 [x1, y1, x2, y2])
+    """
+    rng = np.random.default_rng(seed)
+
+    # 暗色渐变背景（亮度低于检测器的白色阈值）
+    base = rng.integers(40, 110)
+    gradient = np.linspace(0, 40, width, dtype=np.float32)[None, :, None]
+    img = np.full((height, width, 3), base, np.float32) + gradient
+    img = np.clip(img, 0, 255).astype(np.uint8)
+
+    # 杂物：深色矩形、线条和圆
+    scale = width / 640
+    for _ in range(clutter):
+        color = tuple(int(c) for c in rng.integers(0, 150, 3))
+        x, y = int(rng.integers(0, width)), int(rng.integers(0, height))
+        kind = rng.integers(0, 3)
+        if kind == 0:
+            w, h = (int(v * scale) for v in rng.integers(10, 80, 2))
+            cv2.rectangle(img, (x, y), (x + w, y + h), color, -1)
+        elif kind == 1:
+            x2, y2 = int(rng.integers(0, width)), int(rng.integers(0, height))
+            cv2.line(img, (x, y), (x2, y2), color, max(1, int(2 * scale)))
+        else:
+            cv2.circle(img, (x, y), int(rng.integers(5, 40) * scale), color, -1)
+
+    # 标签：宽度约为图像的 15%~25%，宽高比约 2.5
+    tag_w = int(width * rng.uniform(0.15, 0.25))
+    tag_h = int(tag_w / 2.5)
+    x1 = int(rng.integers(0, width - tag_w))
+    y1 = int(rng.integers(0, height - tag_h))
+    cv2.rectangle(img, (x1, y1), (x1 + tag_w, y1 + tag_h), (255, 255, 255), -1)
+
+    # 黑色数字，按标签尺寸缩放字体
+    font = cv2.FONT_HERSHEY_SIMPLEX
+    thickness = max(2, tag_h // 7)
+    font_scale = cv2.getFontScaleFromHeight(font, int(tag_h * 0.6), thickness)
+    (text_w, text_h), _ = cv2.getTextSize(code, font, font_scale, thickness)
+    origin = (x1 + (tag_w - text_w) // 2, y1 + (tag_h + text_h) // 2)
+    cv2.putText(img, code, origin, font, font_scale, (0, 0, 0), thickness)
+
+    # 高斯噪声
+    if noise > 0:
+        img = np.clip(img + rng.normal(0, noise, img.shape), 0, 255).astype(np.uint8)
+
+    return img, [x1, y1, x1 + tag_w, y1 + tag_h]
+
+
+class StubReader:
+    """EasyOCR 不可用时的替身，返回固定文本，仅用于测量引擎自身开销"""
+
+    def __init__(self, text: str = "001", confidence: float = 0.9):
+        self.text = text
+        self.confidence = confidence
+
+    def readtext(self, image):
+        h, w = image.shape[:2]
+        return [([[0, 0], [w, 0], [w, h], [0, h]], self.text, self.confidence)]
+
+    def readtext_batched(self, images, batch_size=1):
+        return [self.readtext(image) for image in images]
+
+
+def _iou(a: List[float], b: List[float]) -> float:
+    x1, y1 = max(a[0], b[0]), max(a[1], b[1])
+    x2, y2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0, x2 - x1) * max(0, y2 - y1)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def measure(fn: Callable[[Any], Any], inputs: List[Any], repeat: int = 1, warmup: int = 1) -> Dict[str, float]:
+    """逐个输入计时，返回吞吐与延迟分位数（毫秒）"""
+    for item in inputs[:warmup]:
+        fn(item)
+
+    latencies = []
+    for _ in range(repeat):
+        for item in inputs:
+            start = time.perf_counter()
+            fn(item)
+            latencies.append(time.perf_counter() - start)
+
+    arr = np.array(latencies) * 1000
+    return {
+        "fps": len(arr) / (arr.sum() / 1000) if arr.sum() > 0 else 0.0,
+        "mean_ms": float(arr.mean()),
+        "p50_ms": float(np.percentile(arr, 50)),
+        "p90_ms": float(np.percentile(arr, 90)),
+        "p99_ms": float(np.percentile(arr, 99)),
+        "samples": int(arr.size),
+    }
+
+
+def run_benchmarks(
+    frames: int = 10,
+    repeat: int = 3,
+    resolutions: Optional[List[str]] = None,
+    detect_max_side: Optional[int] = None
+) -> Dict[str, Any]:
+    """运行全部基准测试"""
+    resolutions = resolutions or list(RESOLUTIONS)
+
+    detector = NumberDetector(lazy=True, detect_max_side=detect_max_side)
+    preprocessor = ImagePreprocessor()
+    ocr_engine = OCREngine(lazy=True)
+    ocr_backend = "easyocr"
+    if not ocr_engine.load_reader():
+        ocr_engine.reader = StubReader()
+        ocr_engine.use_easyocr = True
+        ocr_backend = "stub"
+
+    results: Dict[str, Any] = {}
+
+    for name in resolutions:
+        width, height = RESOLUTIONS[name]
+        samples = [generate_tag_image(width, height, code=f"{i % 1000:03d}", seed=i) for i in range(frames)]
+        images = [img for img, _ in samples]
+        encoded = [cv2.imencode(".jpg", img, [int(cv2.IMWRITE_JPEG_QUALITY), 90])[1].tobytes() for img in images]
+
+        # 检测命中率：任一检测框与真实框 IoU > 0.5
+        hits = 0
+        for img, truth in samples:
+            detections = detector.detect(img)
+            if any(_iou(det["bbox"], truth) > 0.5 for det in detections):
+                hits += 1
+
+        results[f"decode/{name}"] = measure(preprocessor.decode_frame, encoded, repeat)
+        results[f"detector/{name}"] = {**measure(detector.detect, images, repeat), "hit_rate": hits / len(samples)}
+
+        def full_pipeline(jpeg: bytes):
+            frame = preprocessor.decode_frame(jpeg)
+            detections = detector.detect_and_crop(frame)
+            if detections:
+                roi = preprocessor.preprocess_for_ocr(detections[0]["roi"])
+                ocr_engine.recognize_number_code(roi)
+
+        results[f"pipeline/{name}"] = measure(full_pipeline, encoded, repeat)
+
+    # 预处理与 OCR 只作用于 ROI，与整图分辨率无关，取 FHD 标签区域
+    rois = []
+    for i in range(frames):
+        img, (x1, y1, x2, y2) = generate_tag_image(1920, 1080, code=f"{i:03d}", seed=1000 + i)
+        rois.append(img[y1:y2, x1:x2])
+    binarized = [preprocessor.preprocess_for_ocr(roi) for roi in rois]
+
+    results["preprocessor/roi"] = measure(preprocessor.preprocess_for_ocr, rois, repeat)
+    results["preprocessor/roi_fused"] = measure(preprocessor.preprocess_for_ocr_gray, rois, repeat)
+    results[f"ocr_engine/{ocr_backend}"] = measure(ocr_engine.recognize_number_code, binarized, repeat)
+
+    # 轻量数字分类器（不依赖 EasyOCR），同时统计识别准确率
+    digit_engine = OCREngine(backend="digits")
+    correct = sum(digit_engine.recognize_number_code(roi)[0] == f"{i:03d}" for i, roi in enumerate(binarized))
+    results["ocr_engine/digits"] = {
+        **measure(digit_engine.recognize_number_code, binarized, repeat),
+        "accuracy": correct / len(binarized),
+    }
+
+    # 投票确认器：模拟识别结果流
+    confirmer = VoteConfirmer(window_size=5, threshold=0.6, debounce_time=0.0)
+    codes = [("001", 0.9), ("001", 0.8), ("002", 0.7), (None, 0.0), ("001", 0.95)] * 200
+    results["vote_confirmer/add_result"] = measure(lambda item: confirmer.add_result(*item), codes, repeat)
+
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "opencv": cv2.__version__,
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "ocr_backend": ocr_backend,
+            "detect_max_side": detect_max_side,
+            "frames": frames,
+            "repeat": repeat,
+            "timestamp": time.time(),
+        },
+        "results": results,
+    }
+
+
+def compare_with_baseline(
+    current: Dict[str, Any],
+    baseline: Dict[str, Any],
+    tolerance: float,
+    min_delta_ms: float = 0.0
+) -> List[str]:
+    """
+    对比基线，返回退化项描述（p50 变慢超过容差，或检测命中率下降）
+
+    p50 需同时超出比例容差与 min_delta_ms 才算退化，亚毫秒级的项不会因计时抖动误报
+    """
+    regressions = []
+    for key, base in baseline.get("results", {}).items():
+        cur = current["results"].get(key)
+        if cur is None:
+            continue
+        if cur["p50_ms"] > max(base["p50_ms"] * (1 + tolerance), base["p50_ms"] + min_delta_ms):
+            regressions.append(
+                f"{key}: p50 {base['p50_ms']:.3f}ms -> {cur['p50_ms']:.3f}ms (+{cur['p50_ms'] / base['p50_ms'] - 1:.0%})"
+            )
+        if "hit_rate" in base and cur.get("hit_rate", 0.0) < base["hit_rate"]:
+            regressions.append(f"{key}: 检测命中率 {base['hit_rate']:.0%} -> {cur['hit_rate']:.0%}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="识别流水线基准测试")
+    parser.add_argument("--frames", type=int, default=10, help="每个分辨率生成的图像数")
+    parser.add_argument("--repeat", type=int, default=3, help="每组输入重复次数")
+    parser.add_argument("--resolutions", nargs="+", choices=list(RESOLUTIONS), help="只测试指定分辨率")
+    parser.add_argument("--detect-max-side", type=int, help="检测器缩放检测的最大边长")
+    parser.add_argument("--output", default="benchmark_results.json", help="结果输出路径")
+    parser.add_argument("--baseline", default=str(DEFAULT_BASELINE), help="基线文件路径")
+    parser.add_argument("--save-baseline", action="store_true", help="将本次结果保存为基线")
+    parser.add_argument("--no-gate", action="store_true", help="只测量，不与基线对比")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="允许的 p50 退化比例")
+    parser.add_argument("--min-delta-ms", type=float, default=0.5, help="p50 至少变慢多少毫秒才算退化")
+    args = parser.parse_args()
+
+    # 测量期间只输出 WARNING 以上的日志，避免日志 I/O 计入耗时
+    logger.remove()
+    handler = logger.add(sys.stderr, level="WARNING")
+    report = run_benchmarks(
+        frames=args.frames,
+        repeat=args.repeat,
+        resolutions=args.resolutions,
+        detect_max_side=args.detect_max_side
+    )
+    logger.remove(handler)
+    logger.add(sys.stderr, level="INFO")
+
+    print(f"{'benchmark':<28}{'fps':>10}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}")
+    for key, stats in report["results"].items():
+        line = f"{key:<28}{stats['fps']:>10.1f}{stats['p50_ms']:>10.3f}{stats['p90_ms']:>10.3f}{stats['p99_ms']:>10.3f}"
+        if "hit_rate" in stats:
+            line += f"  hit {stats['hit_rate']:.0%}"
+        print(line)
+
+    Path(args.output).write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+    logger.info(f"结果已写入 {args.output}")
+
+    baseline_path = Path(args.baseline)
+    if args.save_baseline:
+        baseline_path.write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+        logger.info(f"基线已保存到 {baseline_path}")
+        return
+
+    if args.no_gate:
+        return
+
+    if not baseline_path.exists():
+        logger.error(f"未找到基线 {baseline_path}，无法进行退化检查（使用 --save-baseline 生成，或 --no-gate 只测量）")
+        sys.exit(2)
+
+    baseline = json.loads(baseline_path.read_text(encoding="utf-8"))
+    regressions = compare_with_baseline(report, baseline, args.tolerance, args.min_delta_ms)
+    if regressions:
+        for item in regressions:
+            logger.error(f"性能退化 {item}")
+        sys.exit(1)
+    logger.info("未发现性能退化")
+
+
+if __name__ == "__main__":
+    main()
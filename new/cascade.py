@@ -0,0 +1,159 @@
+"""
+置信度门控的识别级联
+
+检测与识别各自按从快到慢的阶段依次执行：某一阶段结果的置信度达到该阶段阈值即停止，
+否则升级到下一阶段；所有阶段都未达标时取置信度最高的结果。
+每个结果记录由哪个阶段给出，并计入 ocr_cascade_stage_total。
+
+    检测阶段: contour（轮廓检测）→ yolo
+    识别阶段: digits（轻量数字分类器）→ easyocr → denoise（降噪后 EasyOCR 重试）
+
+配置为逗号分隔的 "阶段:阈值"，如 "digits:0.8,easyocr:0.5,denoise"（省略阈值表示 0，有结果即接受）
+
+检测阈值只对 YOLO 有实际门控作用：轮廓检测的结果置信度为固定值（detector.CONTOUR_CONFIDENCE = 0.85），
+contour 阶段的阈值不高于该值时有结果即接受，高于该值时总是升级到下一阶段。
+easyocr / denoise 阶段需要 easyocr 识别后端（digits 后端不加载 EasyOCR），digits 阶段在两种后端下均可用。
+"""
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from loguru import logger
+
+from metrics import inc
+from preprocessor import ImagePreprocessor
+
+DETECT_STAGES = ("contour", "yolo")
+RECOGNIZE_STAGES = ("digits", "easyocr", "denoise")
+
+# 需要 EasyOCR Reader 的识别阶段
+EASYOCR_STAGES = ("easyocr", "denoise")
+
+# (阶段名, 置信度阈值)
+Stage = Tuple[str, float]
+
+
+def parse_stages(spec: str, allowed: Sequence[str]) -> List[Stage]:
+    """解析 "阶段:阈值,阶段:阈值" 格式的级联配置"""
+    stages = []
+    for item in spec.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        name, _, threshold = item.partition(":")
+        name = name.strip()
+        if name not in allowed:
+            raise ValueError(f"未知的级联阶段: {name}（可选: {', '.join(allowed)}）")
+        stages.append((name, float(threshold) if threshold else 0.0))
+    if not stages:
+        raise ValueError("级联配置至少需要一个阶段")
+    return stages
+
+
+class CascadePolicy:
+    """检测与识别的级联策略"""
+
+    def __init__(
+        self,
+        detect: Sequence[Stage] = (("contour", 0.0), ("yolo", 0.0)),
+        recognize: Sequence[Stage] = (("digits", 0.8), ("easyocr", 0.5), ("denoise", 0.0))
+    ):
+        """
+        Args:
+            detect: 检测阶段及阈值（阈值与最高检测置信度比较，无检测结果总是升级；
+                轮廓检测的置信度为固定值，contour 阶段的阈值只决定是否总是升级）
+            recognize: 识别阶段及阈值（阈值与识别置信度比较，未识别出编号总是升级）
+        """
+        for name, threshold in detect:
+            if name not in DETECT_STAGES:
+                raise ValueError(f"未知的检测阶段: {name}")
+            if name == "contour" and threshold > 0:
+                logger.warning(f"轮廓检测的置信度为固定值，contour 阶段的阈值 {threshold} 不按检测质量门控")
+        for name, _ in recognize:
+            if name not in RECOGNIZE_STAGES:
+                raise ValueError(f"未知的识别阶段: {name}")
+
+        self.detect_stages = list(detect)
+        self.recognize_stages = list(recognize)
+
+    @classmethod
+    def parse(cls, detect_spec: Optional[str], recognize_spec: Optional[str]) -> "CascadePolicy":
+        """从配置字符串创建，未配置的一侧使用默认阶段"""
+        kwargs = {}
+        if detect_spec:
+            kwargs["detect"] = parse_stages(detect_spec, DETECT_STAGES)
+        if recognize_spec:
+            kwargs["recognize"] = parse_stages(recognize_spec, RECOGNIZE_STAGES)
+        return cls(**kwargs)
+
+    def check_backend(self, backend: str):
+        """检查识别后端能否执行全部识别阶段：easyocr / denoise 阶段需要 easyocr 后端"""
+        stages = [name for name, _ in self.recognize_stages if name in EASYOCR_STAGES]
+        if backend != "easyocr" and stages:
+            raise ValueError(
+                f"识别后端 {backend} 不加载 EasyOCR，无法执行级联识别阶段 {', '.join(stages)}"
+                f"（digits 阶段在 easyocr 后端下同样可用）"
+            )
+
+    def detect(self, detector: Any, image: np.ndarray, source_scale: float = 1.0) -> List[Dict[str, Any]]:
+        """
+        按级联执行检测，返回的检测结果带有 "stage" 字段
+
+        Args:
+            detector: NumberDetector
+        """
+        best: List[Dict[str, Any]] = []
+        best_stage, best_score = None, -1.0
+
+        for stage, threshold in self.detect_stages:
+            detections = detector.detect_stage(image, stage, source_scale)
+            if not detections:
+                continue
+
+            score = max(det["confidence"] for det in detections)
+            if score > best_score:
+                best, best_stage, best_score = detections, stage, score
+            if score >= threshold:
+                break
+
+        inc("ocr_cascade_stage_total", kind="detect", stage=best_stage or "none")
+        return [{**det, "stage": best_stage} for det in best]
+
+    def recognize(
+        self,
+        ocr_engine: Any,
+        roi: np.ndarray,
+        prepare: Callable[[np.ndarray], np.ndarray]
+    ) -> Tuple[Optional[str], float, str]:
+        """
+        按级联识别单个ROI
+
+        Args:
+            ocr_engine: OCREngine（easyocr 阶段使用其 EasyOCR 识别）
+            roi: 检测器裁剪的原始ROI（数字分类器直接使用）
+            prepare: EasyOCR 阶段的预处理（如放大 + 二值化）
+
+        Returns:
+            (识别结果, 置信度, 给出结果的阶段)；均未识别时阶段为最后执行的阶段
+        """
+        best: Tuple[Optional[str], float] = (None, 0.0)
+        best_stage = self.recognize_stages[-1][0]
+
+        for stage, threshold in self.recognize_stages:
+            if stage == "digits":
+                code, confidence, _ = ocr_engine.recognize_digits(roi)
+            elif stage == "easyocr":
+                code, confidence = ocr_engine.recognize_number_code(prepare(roi))
+            else:
+                code, confidence = ocr_engine.recognize_number_code(prepare(ImagePreprocessor.denoise(roi)))
+
+            if code and confidence > best[1]:
+                best, best_stage = (code, confidence), stage
+            if code and confidence >= threshold:
+                break
+
+        inc("ocr_cascade_stage_total", kind="recognize", stage=best_stage)
+        return best[0], best[1], best_stage
+
+    def describe(self) -> Dict[str, List[Stage]]:
+        return {"detect": self.detect_stages, "recognize": self.recognize_stages}
@@ -1,159 +1,439 @@
 """
 YOLOv8 数字标签检测器
 """
+import importlib.util
+import time
 import cv2
 import numpy as np
 from pathlib import Path
 from typing import Optional, List, Dict, Any
 from loguru import logger
 
-try:
-    from ultralytics import YOLO
-    YOLO_AVAILABLE = True
-except ImportError:
-    YOLO_AVAILABLE = False
+from metrics import stage_timer, observe, inc
+from nms import to_array, nms
+
+# 只检查是否安装，ultralytics/torch 在首次加载模型时才导入
+YOLO_AVAILABLE = importlib.util.find_spec("ultralytics") is not None
+if not YOLO_AVAILABLE:
     logger.warning("ultralytics未安装，将使用备用检测方案")
 
+ONNXRUNTIME_AVAILABLE = importlib.util.find_spec("onnxruntime") is not None
+
+# 裁剪ROI时检测框四周的留白（像素）
+CROP_PADDING = 5
+
+# YOLO 推理后端: torch（ultralytics 直接推理）/ onnx（导出后用 onnxruntime 在 CPU 上推理）
+YOLO_BACKENDS = ("torch", "onnx")
+
+# 轮廓检测结果的固定置信度（轮廓检测不给出评分，级联的检测阈值只对 YOLO 起门控作用）
+CONTOUR_CONFIDENCE = 0.85
+
+
+class TagTracker:
+    """
+    单个视频流的标签跟踪状态
+
+    首次检测后在上一帧位置附近的搜索窗口内做模板匹配跟随检测框，
+    匹配分数低于阈值或距上次完整检测达到 redetect_interval 帧时重新完整检测。
+    状态只包含缩小后的模板和框，可随帧在工作进程间传递。
+    """
+
+    def __init__(
+        self,
+        redetect_interval: int = 10,
+        min_score: float = 0.6,
+        search_margin: float = 0.5,
+        template_side: int = 96
+    ):
+        """
+        Args:
+            redetect_interval: 每隔多少帧强制完整检测一次
+            min_score: 模板匹配（TM_CCOEFF_NORMED）的最低分数
+            search_margin: 搜索窗口在检测框四周扩展的比例（相对框宽高）
+            template_side: 模板缩小后的最大边长，决定匹配开销
+        """
+        self.redetect_interval = redetect_interval
+        self.min_score = min_score
+        self.search_margin = search_margin
+        self.template_side = template_side
+
+        # 跟踪目标: {"det": 检测结果, "template": 缩小后的灰度模板, "scale": 缩放比例}
+        self.targets: List[Dict[str, Any]] = []
+        self.frames_since_detect = 0
+        self.tracked_frames = 0
+        self.detect_frames = 0
+
+    @property
+    def active(self) -> bool:
+        return bool(self.targets) and self.frames_since_detect < self.redetect_interval
+
+    def reset(self, image: Optional[np.ndarray] = None, detections: Optional[List[Dict[str, Any]]] = None):
+        """以一次完整检测的结果重新初始化模板"""
+        self.targets = []
+        self.frames_since_detect = 0
+        for det in detections or []:
+            x1, y1, x2, y2 = map(int, det["bbox"])
+            if x2 - x1 < 2 or y2 - y1 < 2:
+                continue
+            scale = min(1.0, self.template_side / max(x2 - x1, y2 - y1))
+            template = self._prepare(image[y1:y2, x1:x2], scale)
+            self.targets.append({"det": det, "template": template, "scale": scale})
+
+    @staticmethod
+    def _prepare(region: np.ndarray, scale: float) -> np.ndarray:
+        gray = cv2.cvtColor(region, cv2.COLOR_BGR2GRAY) if region.ndim == 3 else region
+        if scale < 1.0:
+            gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        return gray
+
+    def track(self, image: np.ndarray) -> Optional[List[Dict[str, Any]]]:
+        """
+        在新帧中跟随所有目标
+
+        Returns:
+            跟踪到的检测结果；任一目标丢失时返回 None，需要完整检测
+        """
+        h, w = image.shape[:2]
+        tracked = []
+        for target in self.targets:
+            x1, y1, x2, y2 = target["det"]["bbox"]
+            bw, bh = x2 - x1, y2 - y1
+            mx, my = bw * self.search_margin, bh * self.search_margin
+            sx1, sy1 = max(0, int(x1 - mx)), max(0, int(y1 - my))
+            sx2, sy2 = min(w, int(x2 + mx)), min(h, int(y2 + my))
+
+            # 只对搜索窗口做灰度转换和缩放
+            search = self._prepare(image[sy1:sy2, sx1:sx2], target["scale"])
+            template = target["template"]
+            if search.shape[0] < template.shape[0] or search.shape[1] < template.shape[1]:
+                return None
+
+            scores = cv2.matchTemplate(search, template, cv2.TM_CCOEFF_NORMED)
+            _, score, _, (tx, ty) = cv2.minMaxLoc(scores)
+            if score < self.min_score:
+                return None
+
+            nx1 = sx1 + int(round(tx / target["scale"]))
+            ny1 = sy1 + int(round(ty / target["scale"]))
+            det = {**target["det"], "bbox": [nx1, ny1, min(w, nx1 + bw), min(h, ny1 + bh)], "track_score": float(score)}
+            target["det"] = det
+            tracked.append(det)
+
+        self.frames_since_detect += 1
+        return tracked
+
 
 class NumberDetector:
     """数字标签检测器"""
     
-    def __init__(self, model_path: str = "yolov8n.pt", confidence: float = 0.5):
+    def __init__(
+        self,
+        model_path: str = "yolov8n.pt",
+        confidence: float = 0.5,
+        lazy: bool = False,
+        detect_max_side: Optional[int] = None,
+        nms_iou: float = 0.5,
+        nms_metric: str = "containment",
+        class_aware_nms: bool = False,
+        soft_nms: bool = False,
+        backend: str = "torch",
+        int8: bool = False,
+        cascade: Any = None
+    ):
+        """
+        Args:
+            model_path: YOLO模型文件名
+            confidence: YOLO置信度阈值
+            lazy: 延迟加载YOLO，直到轮廓检测失败需要回退时才导入 ultralytics
+            detect_max_side: 轮廓检测的最大边长，大图先缩小到此尺寸查找候选再映射回原图，None 表示不缩放
+            nms_iou: 合并重叠检测框的阈值
+            nms_metric: 合并的重叠度量，containment（默认，与已保留框的交集超过候选框面积的 nms_iou 即合并，
+                大标签内的小框会被合并）或 iou（交并比）；Soft-NMS 始终按 IoU 衰减
+            class_aware_nms: 只合并同类别的检测框
+            soft_nms: 使用 Soft-NMS 衰减重叠框的置信度而不是直接丢弃
+            backend: YOLO推理后端，torch 或 onnx（onnx 模式下工作进程不导入 torch）
+            int8: onnx 后端使用 int8 动态量化模型
+            cascade: CascadePolicy，设置后按其检测阶段与阈值执行，替代固定的 轮廓 → YOLO 回退
+        """
+        if backend not in YOLO_BACKENDS:
+            raise ValueError(f"未知的YOLO推理后端: {backend}")
+        
         self.confidence = confidence
+        self.detect_max_side = detect_max_side
+        self.nms_iou = nms_iou
+        self.nms_metric = nms_metric
+        self.class_aware_nms = class_aware_nms
+        self.soft_nms = soft_nms
+        self.model_path = model_path
+        self.backend = backend
+        self.int8 = int8
+        self.cascade = cascade
         self.model = None
-        self.use_yolo = YOLO_AVAILABLE
+        self.use_yolo = ONNXRUNTIME_AVAILABLE if backend == "onnx" else YOLO_AVAILABLE
+        
+        # 加载状态: pending / loading / ready / failed / unavailable
+        self.load_state = "pending" if self.use_yolo else "unavailable"
+        self.load_time = 0.0
         
-        if YOLO_AVAILABLE:
+        if self.use_yolo and not lazy:
+            self.load_model()
+    
+    def load_model(self) -> bool:
+        """加载YOLO模型，已加载或不可用时直接返回"""
+        if self.model is not None:
+            return True
+        if not self.use_yolo:
+            return False
+        
+        self.load_state = "loading"
+        start = time.time()
+        
+        if self.backend == "onnx":
+            from onnx_backend import load_backend
+            
+            # 首次使用时导出一次，之后直接加载缓存的 ONNX 文件
+            self.model = load_backend(self.model_path, int8=self.int8)
+            if self.model is None:
+                self.use_yolo = False
+            self.load_state = "ready" if self.model is not None else "failed"
+            self.load_time = time.time() - start
+            return self.model is not None
+        
+        try:
+            from ultralytics import YOLO
+            
+            # PyTorch 2.6+ 安全加载处理
+            import torch
+            
+            # 临时禁用weights_only限制（信任的模型源）
+            original_load = torch.load
+            def patched_load(*args, **kwargs):
+                kwargs['weights_only'] = False
+                return original_load(*args, **kwargs)
+            torch.load = patched_load
+            
             try:
-                # PyTorch 2.6+ 安全加载处理
-                import torch
-                
-                # 临时禁用weights_only限制（信任的模型源）
-                original_load = torch.load
-                def patched_load(*args, **kwargs):
-                    kwargs['weights_only'] = False
-                    return original_load(*args, **kwargs)
-                torch.load = patched_load
+                # 尝试加载自定义模型，否则使用预训练模型
+                custom_model = Path(__file__).parent.parent / "models" / self.model_path
+                if custom_model.exists():
+                    self.model = YOLO(str(custom_model))
+                    logger.info(f"✅ 加载自定义YOLO模型: {custom_model}")
+                else:
+                    # 使用预训练模型（会自动下载）
+                    self.model = YOLO(self.model_path)
+                    logger.info(f"✅ 加载预训练YOLO模型: {self.model_path}")
+            finally:
+                # 恢复原始torch.load
+                torch.load = original_load
+            
+            self.load_state = "ready"
                 
-                try:
-                    # 尝试加载自定义模型，否则使用预训练模型
-                    custom_model = Path(__file__).parent.parent / "models" / model_path
-                    if custom_model.exists():
-                        self.model = YOLO(str(custom_model))
-                        logger.info(f"✅ 加载自定义YOLO模型: {custom_model}")
-                    else:
-                        # 使用预训练模型（会自动下载）
-                        self.model = YOLO(model_path)
-                        logger.info(f"✅ 加载预训练YOLO模型: {model_path}")
-                finally:
-                    # 恢复原始torch.load
-                    torch.load = original_load
-                    
-            except Exception as e:
-                logger.error(f"YOLO模型加载失败: {e}")
-                self.use_yolo = False
+        except Exception as e:
+            logger.error(f"YOLO模型加载失败: {e}")
+            self.use_yolo = False
+            self.load_state = "failed"
+        finally:
+            self.load_time = time.time() - start
+        
+        return self.model is not None
     
-    def detect(self, image: np.ndarray) -> List[Dict[str, Any]]:
+    def detect(
+        self,
+        image: np.ndarray,
+        tracker: Optional[TagTracker] = None,
+        source_scale: float = 1.0
+    ) -> List[Dict[str, Any]]:
         """
         检测图像中的数字标签
         
+        Args:
+            tracker: 视频流的跟踪状态；传入时优先在上一帧位置附近跟随，失败或到期才完整检测
+            source_scale: 传入图像相对原图的缩放比例（如 JPEG 缩小解码得到的图像），
+                尺寸阈值仍按原图像素换算，返回的坐标属于传入图像
+        
         Returns:
             List[Dict]: [{"bbox": [x1,y1,x2,y2], "confidence": 0.95, "class": "number_tag"}]
         """
         if image is None:
             return []
         
-        # 直接使用轮廓检测（YOLO未训练数字标签）
-        detections = self._detect_with_contour(image)
+        inc("ocr_frames_total")
+        
+        if tracker is not None and tracker.active:
+            with stage_timer("track"):
+                tracked = tracker.track(image)
+            if tracked is not None:
+                tracker.tracked_frames += 1
+                inc("ocr_tracker_frames_total", result="tracked")
+                observe("ocr_detections_per_frame", len(tracked))
+                return tracked
+            inc("ocr_tracker_frames_total", result="lost")
+        
+        if self.cascade is not None:
+            detections = self.cascade.detect(self, image, source_scale)
+        else:
+            # 直接使用轮廓检测（YOLO未训练数字标签）
+            detections = self.detect_stage(image, "contour", source_scale)
+            
+            # 如果轮廓检测失败且YOLO可用，尝试YOLO（延迟模式下此时才加载）
+            if not detections and self.use_yolo and self.load_model():
+                inc("ocr_yolo_fallback_total")
+                detections = self.detect_stage(image, "yolo")
         
-        # 如果轮廓检测失败且YOLO可用，尝试YOLO
-        if not detections and self.use_yolo and self.model is not None:
-            detections = self._detect_with_yolo(image)
+        if tracker is not None:
+            tracker.detect_frames += 1
+            tracker.reset(image, detections)
         
+        observe("ocr_detections_per_frame", len(detections))
         return detections
     
-    def _detect_with_yolo(self, image: np.ndarray) -> List[Dict[str, Any]]:
+    def detect_stage(
+        self,
+        image: np.ndarray,
+        stage: str,
+        source_scale: float = 1.0,
+        confidence: Optional[float] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        执行单个检测阶段: contour / yolo（YOLO 不可用时返回空列表）
+
+        Args:
+            confidence: 本次调用的YOLO置信度阈值，None 时使用 self.confidence
+        """
+        if stage == "contour":
+            with stage_timer("contour"):
+                return self._detect_with_contour(image, source_scale)
+        if stage == "yolo":
+            if not self.load_model():
+                return []
+            with stage_timer("yolo"):
+                return self._detect_with_yolo(image, confidence)
+        raise ValueError(f"未知的检测阶段: {stage}")
+    
+    def _detect_with_yolo(self, image: np.ndarray, confidence: Optional[float] = None) -> List[Dict[str, Any]]:
         """使用YOLO进行检测"""
+        if confidence is None:
+            confidence = self.confidence
         try:
-            results = self.model(image, conf=self.confidence, verbose=False)
+            if image.ndim == 2:
+                image = cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+            
+            if self.backend == "onnx":
+                boxes, scores, classes = self.model(image, confidence)
+                return self._to_detections(boxes, scores, classes, self.model.names)
+            
+            results = self.model(image, conf=confidence, verbose=False)
             detections = []
             
             for result in results:
                 boxes = result.boxes
-                if boxes is not None:
-                    for box in boxes:
-                        x1, y1, x2, y2 = box.xyxy[0].tolist()
-                        conf = float(box.conf[0])
-                        cls = int(box.cls[0])
-                        
-                        detections.append({
-                            "bbox": [x1, y1, x2, y2],
-                            "confidence": conf,
-                            "class": result.names.get(cls, "unknown")
-                        })
+                if boxes is not None and len(boxes):
+                    # 整批取出到 NumPy，避免逐框访问张量
+                    detections.extend(self._to_detections(
+                        boxes.xyxy.cpu().numpy(),
+                        boxes.conf.cpu().numpy(),
+                        boxes.cls.cpu().numpy().astype(int),
+                        result.names
+                    ))
             
             return detections
         except Exception as e:
             logger.error(f"YOLO检测失败: {e}")
             return self._detect_with_contour(image)
     
-    def _detect_with_contour(self, image: np.ndarray) -> List[Dict[str, Any]]:
+    @staticmethod
+    def _to_detections(
+        boxes: np.ndarray,
+        scores: np.ndarray,
+        classes: np.ndarray,
+        names: Dict[int, str]
+    ) -> List[Dict[str, Any]]:
+        """将框、置信度、类别数组转换为检测结果列表"""
+        return [
+            {"bbox": bbox, "confidence": conf, "class": names.get(cls, "unknown")}
+            for bbox, conf, cls in zip(boxes.tolist(), scores.tolist(), classes.tolist())
+        ]
+    
+    def _detect_with_contour(self, image: np.ndarray, source_scale: float = 1.0) -> List[Dict[str, Any]]:
         """
         精准检测白底黑字数字标签
         """
         try:
             h, w = image.shape[:2]
-            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
             
-            all_detections = []
+            # 多分辨率检测：大图在缩小的副本上查找候选，坐标再映射回原图
+            scale = 1.0
+            if self.detect_max_side and max(h, w) > self.detect_max_side:
+                scale = self.detect_max_side / max(h, w)
+                image = cv2.resize(image, (round(w * scale), round(h * scale)), interpolation=cv2.INTER_LINEAR)
+            # 单通道输入（灰度解码）无需转换
+            gray = image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+            sh, sw = gray.shape[:2]
+            
+            # 尺寸阈值按缩放比例换算（均以原图像素定义）
+            size_scale = scale * source_scale
+            min_area = 1000 * size_scale * size_scale  # 提高最小面积
+            max_area = sh * sw * 0.5  # 降低最大面积
+            min_w, min_h = 50 * size_scale, 30 * size_scale  # 提高最小尺寸要求
+            kernel_size = max(3, int(round(5 * size_scale)) | 1)
             
             # 只使用白色区域检测（更精准）
             # 检测亮度高的白色区域
             _, white_mask = cv2.threshold(gray, 200, 255, cv2.THRESH_BINARY)
             
             # 形态学闭运算填充小洞
-            kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (5, 5))
+            kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (kernel_size, kernel_size))
             white_mask = cv2.morphologyEx(white_mask, cv2.MORPH_CLOSE, kernel, iterations=2)
             
             # 查找轮廓
             contours, _ = cv2.findContours(white_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
             
-            for contour in contours:
-                area = cv2.contourArea(contour)
-                
-                # 严格的面积限制（只检测中等大小的标签）
-                min_area = 1000  # 提高最小面积
-                max_area = h * w * 0.5  # 降低最大面积
-                
-                if area < min_area or area > max_area:
-                    continue
-                
-                x, y, bw, bh = cv2.boundingRect(contour)
-                
-                # 严格的尺寸要求
-                if bw < 50 or bh < 30:  # 提高最小尺寸要求
-                    continue
-                
-                # 严格的宽高比（标签通常是横向矩形）
-                aspect_ratio = bw / bh if bh > 0 else 0
-                if not (1.5 < aspect_ratio < 4.5):  # 更严格的宽高比
-                    continue
-                
-                # 检查区域内是否有足够的黑色像素（文字）
-                roi = gray[y:y+bh, x:x+bw]
-                dark_pixels = np.sum(roi < 120)
-                total_pixels = roi.size
-                dark_ratio = dark_pixels / total_pixels if total_pixels > 0 else 0
-                
-                # 必须有10%-60%的深色像素（文字区域）
-                if not (0.1 < dark_ratio < 0.6):
-                    continue
-                
-                all_detections.append({
-                    "bbox": [x, y, x + bw, y + bh],
-                    "confidence": 0.85,
-                    "class": "number_tag"
-                })
+            if not contours:
+                return []
+            
+            # 所有轮廓的面积与外接矩形一次性整理为数组，筛选全部向量化
+            areas = np.array([cv2.contourArea(c) for c in contours])
+            rects = np.array([cv2.boundingRect(c) for c in contours]).reshape(-1, 4)
+            x, y, bw, bh = rects.T
+            
+            # 严格的面积限制（只检测中等大小的标签）+ 严格的尺寸要求
+            keep = (areas >= min_area) & (areas <= max_area) & (bw >= min_w) & (bh >= min_h)
+            # 严格的宽高比（标签通常是横向矩形）
+            aspect_ratio = bw / np.maximum(bh, 1)
+            keep &= (aspect_ratio > 1.5) & (aspect_ratio < 4.5)
+            if not keep.any():
+                return []
+            x, y, bw, bh = x[keep], y[keep], bw[keep], bh[keep]
+            
+            # 检查区域内是否有足够的黑色像素（文字）：
+            # 深色掩码的积分图每帧只算一次（仅覆盖全部候选的外接区域），
+            # 每个候选框的深色像素数由四个角点 O(1) 得到
+            x2, y2 = x + bw, y + bh
+            ox, oy = x.min(), y.min()
+            region = gray[oy:y2.max(), ox:x2.max()]
+            _, dark_mask = cv2.threshold(region, 119, 1, cv2.THRESH_BINARY_INV)
+            integral = cv2.integral(dark_mask)
+            lx, ly, lx2, ly2 = x - ox, y - oy, x2 - ox, y2 - oy
+            dark_pixels = integral[ly2, lx2] - integral[ly, lx2] - integral[ly2, lx] + integral[ly, lx]
+            dark_ratio = dark_pixels / (bw * bh)
+            
+            # 必须有10%-60%的深色像素（文字区域）
+            keep = (dark_ratio > 0.1) & (dark_ratio < 0.6)
+            boxes = np.stack([x, y, x2, y2], axis=1)[keep]
+            
+            if scale != 1.0:
+                # 映射回原图坐标
+                boxes = np.stack([
+                    np.floor(boxes[:, 0] / scale),
+                    np.floor(boxes[:, 1] / scale),
+                    np.minimum(w, np.ceil(boxes[:, 2] / scale)),
+                    np.minimum(h, np.ceil(boxes[:, 3] / scale)),
+                ], axis=1).astype(int)
+            
+            all_detections = [
+                {"bbox": box, "confidence": CONTOUR_CONFIDENCE, "class": "number_tag"}
+                for box in boxes.tolist()
+            ]
             
             # 去重和合并
             final_detections = self._merge_detections(all_detections, h, w)
@@ -166,41 +446,36 @@ class NumberDetector:
             return []
     
     def _merge_detections(self, detections: List[Dict], h: int, w: int) -> List[Dict[str, Any]]:
-        """合并重叠的检测框"""
+        """合并重叠的检测框（向量化 NMS，保留置信度最高的框），结果按面积从大到小排列"""
         if not detections:
             return []
         
-        merged = []
-        for det in detections:
-            x1, y1, x2, y2 = det["bbox"]
-            area = (x2 - x1) * (y2 - y1)
-            
-            # 检查是否与已有检测重叠
-            is_merged = False
-            for existing in merged:
-                ex1, ey1, ex2, ey2 = existing["bbox"]
-                overlap_x = max(0, min(x2, ex2) - max(x1, ex1))
-                overlap_y = max(0, min(y2, ey2) - max(y1, ey1))
-                overlap_area = overlap_x * overlap_y
-                
-                if overlap_area > area * 0.5:
-                    # 合并：选择置信度更高的
-                    if det["confidence"] > existing["confidence"]:
-                        existing["bbox"] = det["bbox"]
-                        existing["confidence"] = det["confidence"]
-                    is_merged = True
-                    break
-            
-            if not is_merged:
-                merged.append(det)
+        classes = None
+        if self.class_aware_nms:
+            _, classes = np.unique([det["class"] for det in detections], return_inverse=True)
+        
+        dets = to_array([det["bbox"] for det in detections], [det["confidence"] for det in detections], classes)
+        keep, scores = nms(
+            dets, iou_threshold=self.nms_iou, class_aware=self.class_aware_nms, soft=self.soft_nms, metric=self.nms_metric
+        )
+        
+        if self.soft_nms:
+            # 衰减后低于检测阈值的框不再保留
+            merged = [
+                {**detections[i], "confidence": score}
+                for i, score in zip(keep.tolist(), scores.tolist())
+                if score >= self.confidence
+            ]
+        else:
+            merged = [detections[i] for i in keep.tolist()]
         
         # 按面积排序
         merged.sort(key=lambda d: (d["bbox"][2] - d["bbox"][0]) * (d["bbox"][3] - d["bbox"][1]), reverse=True)
         return merged
     
-    def detect_and_crop(self, image: np.ndarray) -> List[Dict[str, Any]]:
-        """检测并裁剪出数字区域"""
-        detections = self.detect(image)
+    def detect_and_crop(self, image: np.ndarray, tracker: Optional[TagTracker] = None) -> List[Dict[str, Any]]:
+        """检测并裁剪出数字区域（跟踪模式下直接从跟踪到的区域裁剪）"""
+        detections = self.detect(image, tracker)
         
         results = []
         for det in detections:
@@ -208,7 +483,7 @@ class NumberDetector:
             x1, y1, x2, y2 = map(int, bbox)
             
             # 添加padding
-            padding = 5
+            padding = CROP_PADDING
             h, w = image.shape[:2]
             x1 = max(0, x1 - padding)
             y1 = max(0, y1 - padding)
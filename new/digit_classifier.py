@@ -0,0 +1,256 @@
+"""
+轻量数字分类器 - 连通域切分 + 模板最近邻
+
+面向白底黑字的印刷数字标签：ROI 二值化后按连通域切出单个字形，
+归一化为固定尺寸的特征向量，与 OpenCV 内置字体渲染出的模板做余弦相似度最近邻分类。
+只依赖 NumPy / OpenCV，单个 ROI 识别耗时在亚毫秒级，并给出每个数字的置信度，
+低置信度的读数可交给 EasyOCR 复核。
+"""
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+import cv2
+
+# 字形归一化尺寸（高 × 宽）
+GLYPH_SIZE = (24, 16)
+
+# 切分前 ROI 缩小到的最大高度
+SEGMENT_MAX_HEIGHT = 64
+
+# 宽高比超过此值的连通域可能是粘连的多个数字；单个数字宽高比不低于 DIGIT_MIN_ASPECT
+DIGIT_MAX_ASPECT = 0.9
+DIGIT_MIN_ASPECT = 0.35
+
+# 渲染模板所用的字体、笔画粗细与旋转角度
+TEMPLATE_FONTS = (
+    cv2.FONT_HERSHEY_SIMPLEX,
+    cv2.FONT_HERSHEY_DUPLEX,
+    cv2.FONT_HERSHEY_COMPLEX,
+    cv2.FONT_HERSHEY_TRIPLEX,
+    cv2.FONT_HERSHEY_PLAIN,
+)
+TEMPLATE_THICKNESS = (1, 2, 3, 5)
+TEMPLATE_ANGLES = (-4.0, 0.0, 4.0)
+
+# 置信度 softmax 温度（作用于各类别的最大相似度）
+SOFTMAX_TEMPERATURE = 0.05
+
+
+def _normalize_glyph(mask: np.ndarray) -> np.ndarray:
+    """
+    将字形前景掩码归一化为特征向量
+
+    等比缩放后居中放入 GLYPH_SIZE 画布，轻微模糊以容忍笔画偏移，
+    去均值并做 L2 归一化，之后点积即为余弦相似度
+    """
+    gh, gw = GLYPH_SIZE
+    h, w = mask.shape
+    scale = min(gh / h, gw / w)
+    nh, nw = max(1, round(h * scale)), max(1, round(w * scale))
+
+    canvas = np.zeros(GLYPH_SIZE, np.float32)
+    y, x = (gh - nh) // 2, (gw - nw) // 2
+    canvas[y:y + nh, x:x + nw] = cv2.resize(mask.astype(np.float32), (nw, nh), interpolation=cv2.INTER_AREA)
+
+    feature = cv2.GaussianBlur(canvas, (3, 3), 0).ravel()
+    feature -= feature.mean()
+    return feature / max(float(np.linalg.norm(feature)), 1e-6)
+
+
+def _render_digit(digit: str, font: int, thickness: int, angle: float) -> np.ndarray:
+    """用 OpenCV 字体渲染单个数字，返回裁剪到字形外接框的前景掩码"""
+    scale = cv2.getFontScaleFromHeight(font, 48, thickness)
+    (tw, th), baseline = cv2.getTextSize(digit, font, scale, thickness)
+    pad = 16 + thickness
+    canvas = np.zeros((th + baseline + 2 * pad, tw + 2 * pad), np.uint8)
+    cv2.putText(canvas, digit, (pad, pad + th), font, scale, 255, thickness, cv2.LINE_AA)
+
+    if angle:
+        h, w = canvas.shape
+        rotation = cv2.getRotationMatrix2D((w / 2, h / 2), angle, 1.0)
+        canvas = cv2.warpAffine(canvas, rotation, (w, h), flags=cv2.INTER_LINEAR)
+
+    ys, xs = np.nonzero(canvas > 127)
+    return (canvas[ys.min():ys.max() + 1, xs.min():xs.max() + 1] > 127).astype(np.uint8)
+
+
+class DigitClassifier:
+    """连通域切分 + 模板最近邻的数字识别"""
+
+    def __init__(
+        self,
+        fonts: Sequence[int] = TEMPLATE_FONTS,
+        thickness: Sequence[int] = TEMPLATE_THICKNESS,
+        angles: Sequence[float] = TEMPLATE_ANGLES
+    ):
+        """用渲染的字体模板初始化（每个数字 len(fonts) × len(thickness) × len(angles) 个模板）"""
+        features = [
+            _normalize_glyph(_render_digit(str(digit), font, t, angle))
+            for digit in range(10)
+            for font in fonts
+            for t in thickness
+            for angle in angles
+        ]
+        # 按数字分组连续存放，转置为 (特征维度, 10 × 每类模板数) 便于直接相乘
+        self.templates = np.ascontiguousarray(np.stack(features).T)
+        self.per_class = len(features) // 10
+
+    def segment(self, image: np.ndarray) -> List[np.ndarray]:
+        """
+        二值化并按连通域切分字形
+
+        Args:
+            image: BGR图像、灰度图或已二值化的单通道图（深色数字、浅色背景）
+
+        Returns:
+            从左到右排列的连通域前景掩码（粗体数字可能粘连，由 classify 拆分）
+        """
+        # 字形最终只有 GLYPH_SIZE 大小，大 ROI 先缩小再转灰度、切分
+        if image.shape[0] > SEGMENT_MAX_HEIGHT:
+            scale = SEGMENT_MAX_HEIGHT / image.shape[0]
+            image = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_LINEAR)
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+        _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+
+        count, labels, stats, _ = cv2.connectedComponentsWithStats(binary, connectivity=8)
+        if count <= 1:
+            return []
+
+        H, W = binary.shape
+        x, y, w, h, area = (stats[1:, k] for k in range(5))
+
+        # 字形候选：高度占 ROI 的 25%~95%、不贴边（标签外的背景与边框）、不过稀疏，
+        # 宽度最多容纳几个粘连的数字
+        candidate = (
+            (h >= 0.25 * H) & (h <= 0.95 * H)
+            & (x > 0) & (y > 0) & (x + w < W) & (y + h < H)
+            & (w <= 4 * h) & (area >= 0.08 * w * h) & (area >= 12)
+        )
+        ids = np.flatnonzero(candidate)
+        if not ids.size:
+            return []
+
+        # 只保留与最高字形同一行、高度相近的候选
+        tallest = ids[np.argmax(h[ids])]
+        center = y[ids] + h[ids] / 2
+        row = (
+            (center >= y[tallest]) & (center <= y[tallest] + h[tallest])
+            & (h[ids] >= 0.6 * h[tallest])
+        )
+        ids = ids[row]
+
+        # 按横坐标排序，横向大幅重叠的连通域视为同一字形的断裂部分
+        groups: List[List[int]] = []
+        for i in ids[np.argsort(x[ids])]:
+            if groups:
+                j = groups[-1][0]
+                overlap = min(x[i] + w[i], x[j] + w[j]) - max(x[i], x[j])
+                if overlap > 0.5 * min(w[i], w[j]):
+                    groups[-1].append(i)
+                    continue
+            groups.append([i])
+
+        glyphs = []
+        for group in groups:
+            x1 = min(x[i] for i in group)
+            y1 = min(y[i] for i in group)
+            x2 = max(x[i] + w[i] for i in group)
+            y2 = max(y[i] + h[i] for i in group)
+            # 标签编号从 1 开始，stats 去掉了背景行
+            box = labels[y1:y2, x1:x2]
+            mask = box == group[0] + 1
+            for i in group[1:]:
+                mask |= box == i + 1
+            glyphs.append(mask.astype(np.uint8))
+        return glyphs
+
+    @staticmethod
+    def _split(mask: np.ndarray, n: int) -> List[np.ndarray]:
+        """将连通域拆成 n 个字形：在每个等分点附近取前景最少的列作为切割位置"""
+        h, w = mask.shape
+        if n == 1:
+            return [mask]
+
+        columns = mask.sum(axis=0)
+        radius = max(1, w // (4 * n))
+
+        cuts = [0]
+        for k in range(1, n):
+            center = k * w // n
+            lo, hi = max(cuts[-1] + 1, center - radius), min(w - 1, center + radius + 1)
+            if lo >= hi:
+                continue
+            cuts.append(lo + int(np.argmin(columns[lo:hi])))
+        cuts.append(w)
+
+        parts = []
+        for a, b in zip(cuts, cuts[1:]):
+            part = mask[:, a:b]
+            rows = np.flatnonzero(part.any(axis=1))
+            if rows.size:
+                parts.append(part[rows[0]:rows[-1] + 1])
+        return parts
+
+    def classify_glyphs(self, glyphs: List[np.ndarray]) -> Tuple[str, List[float]]:
+        """
+        对切分好的字形分类
+
+        每个类别取与该类模板的最大余弦相似度，置信度为各类别相似度 softmax 后
+        最高类别的概率乘以其相似度（与所有模板都不像的字形置信度也低）
+
+        Returns:
+            (数字串, 每个数字的置信度)
+        """
+        if not glyphs:
+            return "", []
+
+        features = np.stack([_normalize_glyph(g) for g in glyphs])
+        similarity = features @ self.templates
+        class_sim = similarity.reshape(len(glyphs), 10, self.per_class).max(axis=2)
+
+        best = class_sim.argmax(axis=1)
+        logits = (class_sim - class_sim.max(axis=1, keepdims=True)) / SOFTMAX_TEMPERATURE
+        probs = np.exp(logits)
+        probs /= probs.sum(axis=1, keepdims=True)
+
+        rows = np.arange(len(glyphs))
+        confidences = probs[rows, best] * np.clip(class_sim[rows, best], 0.0, 1.0)
+        return "".join(str(d) for d in best), [float(c) for c in confidences]
+
+    def classify(self, image: np.ndarray) -> Tuple[str, List[float]]:
+        """
+        切分并识别 ROI 中的数字，未找到字形时返回 ("", [])
+
+        过宽的连通域依次尝试拆成 1 ~ n 个字形，取平均置信度最高的拆法
+        """
+        if image is None or image.size == 0:
+            return "", []
+
+        masks = self.segment(image)
+        text, confidences = self.classify_glyphs(masks)
+
+        digits = []
+        for k, mask in enumerate(masks):
+            best = (text[k], confidences[k:k + 1])
+            h, w = mask.shape
+            if w > DIGIT_MAX_ASPECT * h:
+                for n in range(2, int(w / (DIGIT_MIN_ASPECT * h)) + 1):
+                    option = self.classify_glyphs(self._split(mask, n))
+                    if option[1] and np.mean(option[1]) > np.mean(best[1]):
+                        best = option
+            digits.append(best)
+
+        text = "".join(d[0] for d in digits)
+        confidences = [c for d in digits for c in d[1]]
+        return text, confidences
+
+
+_default_classifier: Optional[DigitClassifier] = None
+
+
+def get_classifier() -> DigitClassifier:
+    """进程内共享的默认分类器（模板只渲染一次）"""
+    global _default_classifier
+    if _default_classifier is None:
+        _default_classifier = DigitClassifier()
+    return _default_classifier
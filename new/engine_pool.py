@@ -0,0 +1,91 @@
+"""
+识别引擎池的规模与线程预算
+
+torch、OpenCV 与 BLAS 各自按核数创建线程池，同一主机上运行多个识别实例时
+线程数成倍超额订阅，负载越高吞吐越低。这里按可用核数决定实例个数与每个实例的线程数，
+使 实例数 × 每实例线程数 不超过核数，并在每个实例内统一设置各库的线程上限。
+
+模式（延迟与吞吐的取舍）:
+    latency     少量实例，每个实例多线程：单个请求最快，并发时排队
+    balanced    两者折中（默认）
+    throughput  每核一个单线程实例：单个请求较慢，总吞吐最高
+"""
+import importlib.util
+import os
+import sys
+from typing import Optional, Tuple
+
+import cv2
+from loguru import logger
+
+THREADPOOLCTL_AVAILABLE = importlib.util.find_spec("threadpoolctl") is not None
+
+# 模式 -> 每个实例的目标线程数
+POOL_MODES = {
+    "latency": 4,
+    "balanced": 2,
+    "throughput": 1,
+}
+
+# 由 OMP_NUM_THREADS 等环境变量控制线程数的库（须在库加载前设置才生效）
+THREAD_ENV_VARS = ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS")
+
+
+def available_cpus() -> int:
+    """当前进程可用的核数（考虑 CPU 亲和性限制）"""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def plan_pool(
+    mode: str = "balanced",
+    workers: Optional[int] = None,
+    cpus: Optional[int] = None
+) -> Tuple[int, int]:
+    """
+    计算实例个数与每个实例的线程数
+
+    Args:
+        mode: latency / balanced / throughput
+        workers: 指定实例个数（None 表示按模式自动计算）
+        cpus: 可用核数（None 表示自动检测）
+
+    Returns:
+        (实例个数, 每个实例的线程数)
+    """
+    if mode not in POOL_MODES:
+        raise ValueError(f"未知的引擎池模式: {mode}（可选: {', '.join(POOL_MODES)}）")
+
+    cpus = cpus or available_cpus()
+    if workers is None:
+        workers = max(1, cpus // POOL_MODES[mode])
+    threads = max(1, cpus // max(1, workers))
+    return workers, threads
+
+
+def apply_thread_budget(threads: int):
+    """
+    限制当前进程内各库的线程数
+
+    OpenCV 与已加载的 torch 立即生效；环境变量对之后才导入的 torch（EasyOCR / YOLO 延迟加载）
+    和 onnxruntime 会话生效；已加载的 BLAS 需要 threadpoolctl 才能调整
+    """
+    for var in THREAD_ENV_VARS:
+        os.environ[var] = str(threads)
+
+    cv2.setNumThreads(threads)
+
+    if "torch" in sys.modules:
+        sys.modules["torch"].set_num_threads(threads)
+
+    if THREADPOOLCTL_AVAILABLE:
+        from threadpoolctl import threadpool_limits
+        threadpool_limits(threads)
+
+    logger.info(f"线程预算: {threads} (pid: {os.getpid()})")
+
+
+def thread_budget() -> int:
+    """当前进程的线程预算，未设置时返回 0（由各库自行决定）"""
+    return int(os.environ.get("OMP_NUM_THREADS", "0") or 0)
@@ -0,0 +1,281 @@
+"""
+编号词典 - 用商品目录中的有效编号约束识别结果
+
+有效编号载入内存中的数字前缀树（trie），后台线程定期重新加载。
+识别结果先按原样（补齐为3位）精确匹配，不在词典中时在 trie 上做加权编辑距离搜索：
+置信度高的数字改动代价高、置信度低的代价低，代价最低且唯一的词典编号作为纠正结果，
+没有足够接近的编号或最优编号不唯一时拒绝该读数，避免误读进入投票窗口。
+
+编号来源:
+    mysql       商品表 code 列（连接参数与 lib/db.ts 相同: DB_HOST / DB_USER / DB_PASSWORD / DB_NAME）
+    文件路径     每行一个编号
+"""
+import importlib.util
+import os
+import re
+import threading
+import time
+import weakref
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from loguru import logger
+
+from metrics import inc
+
+PYMYSQL_AVAILABLE = importlib.util.find_spec("pymysql") is not None
+
+DEFAULT_QUERY = "SELECT code FROM products WHERE code IS NOT NULL"
+
+# 读数缺少一个数字时补入的代价（改动已识别数字的代价为该数字的置信度）
+INSERT_COST = 1.0
+
+# 允许的最大纠正代价
+MAX_COST = 1.0
+
+_END = "$"
+
+# 需要定期刷新的词典；fork 出的子进程（pre-fork 服务）不继承线程，由下方的 fork 钩子重新启动刷新线程
+_live_lexicons: "weakref.WeakSet[Lexicon]" = weakref.WeakSet()
+
+
+def _restart_refresh_threads():
+    for lexicon in list(_live_lexicons):
+        lexicon._start_refresh_thread()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_restart_refresh_threads)
+
+
+def normalize_code(value: Any) -> Optional[str]:
+    """将词典条目规范为与识别结果相同的形式：纯数字，不足3位补零；其他形式的编号忽略"""
+    text = str(value).strip() if value is not None else ""
+    if not text.isdigit():
+        return None
+    return text.zfill(3)
+
+
+class DigitTrie:
+    """数字编号前缀树"""
+
+    def __init__(self, codes: Iterable[str] = ()):
+        self.root: Dict[str, Any] = {}
+        self.size = 0
+        for code in codes:
+            self.insert(code)
+
+    def insert(self, code: str):
+        node = self.root
+        for ch in code:
+            node = node.setdefault(ch, {})
+        if _END not in node:
+            node[_END] = code
+            self.size += 1
+
+    def __contains__(self, code: str) -> bool:
+        node = self.root
+        for ch in code:
+            node = node.get(ch)
+            if node is None:
+                return False
+        return _END in node
+
+    def __len__(self) -> int:
+        return self.size
+
+    def search(
+        self,
+        text: str,
+        weights: Optional[Sequence[float]] = None,
+        max_cost: float = MAX_COST
+    ) -> List[Tuple[str, float]]:
+        """
+        加权编辑距离搜索
+
+        Args:
+            text: 识别出的数字串
+            weights: 每个数字的改动代价（通常为其置信度），默认均为 1
+            max_cost: 超过此代价的编号不返回
+
+        Returns:
+            [(编号, 代价), ...]，按代价从低到高排列
+        """
+        weights = list(weights) if weights is not None else [1.0] * len(text)
+
+        # 第一行：词典编号为空时，删除读数前 i 个数字的代价
+        first = [0.0]
+        for w in weights:
+            first.append(first[-1] + w)
+
+        results: List[Tuple[str, float]] = []
+        stack = [(self.root, first)]
+        while stack:
+            node, row = stack.pop()
+            for ch, child in node.items():
+                if ch == _END:
+                    continue
+                new = [row[0] + INSERT_COST]
+                for i, observed in enumerate(text, start=1):
+                    new.append(min(
+                        row[i] + INSERT_COST,
+                        new[i - 1] + weights[i - 1],
+                        row[i - 1] + (0.0 if observed == ch else weights[i - 1]),
+                    ))
+                if _END in child and new[-1] <= max_cost:
+                    results.append((child[_END], new[-1]))
+                if min(new) <= max_cost:
+                    stack.append((child, new))
+
+        results.sort(key=lambda item: item[1])
+        return results
+
+
+class Lexicon:
+    """定期刷新的有效编号词典"""
+
+    def __init__(self, loader: Callable[[], Iterable[Any]], refresh_interval: float = 300.0):
+        """
+        Args:
+            loader: 返回全部有效编号的函数
+            refresh_interval: 刷新间隔（秒），0 表示只在创建时加载一次
+        """
+        self.loader = loader
+        self.refresh_interval = refresh_interval
+        self.trie = DigitTrie()
+        self.loaded_at = 0.0
+        self._stop = threading.Event()
+
+        self.refresh()
+        if refresh_interval > 0:
+            _live_lexicons.add(self)
+        self._start_refresh_thread()
+
+    def _start_refresh_thread(self):
+        if self.refresh_interval > 0 and not self._stop.is_set():
+            threading.Thread(target=self._refresh_loop, name="lexicon-refresh", daemon=True).start()
+
+    def refresh(self) -> bool:
+        """重新加载编号，失败时保留旧词典"""
+        try:
+            codes = [code for code in map(normalize_code, self.loader()) if code]
+        except Exception as e:
+            logger.error(f"编号词典加载失败: {e}")
+            return False
+
+        # 新建 trie 后整体替换引用，识别线程始终看到完整的一版
+        self.trie = DigitTrie(codes)
+        self.loaded_at = time.time()
+        logger.info(f"编号词典已加载: {len(self.trie)} 个编号")
+        return True
+
+    def _refresh_loop(self):
+        while not self._stop.wait(self.refresh_interval):
+            self.refresh()
+
+    def close(self):
+        self._stop.set()
+        _live_lexicons.discard(self)
+
+    def __len__(self) -> int:
+        return len(self.trie)
+
+    def constrain(
+        self,
+        text: str,
+        confidence: float,
+        digit_confidences: Optional[Sequence[float]] = None
+    ) -> Tuple[Optional[str], float]:
+        """
+        将识别文本约束到词典编号
+
+        Args:
+            text: 识别出的原始文本
+            confidence: 整体置信度（没有逐数字置信度时作为每个数字的改动代价）
+            digit_confidences: 与 text 中数字一一对应的置信度
+
+        Returns:
+            (词典编号, 重新计算的置信度)；无法确定时返回 (None, 0.0)
+        """
+        trie = self.trie
+        runs = re.findall(r"\d+", text or "")
+        if not runs:
+            return None, 0.0
+
+        # 候选：各段数字及其拼接（EasyOCR 可能把一个编号拆成多段）
+        candidates = list(dict.fromkeys(runs + ["".join(runs)]))
+
+        # 原样精确匹配（含补零，如 "8" -> "008"）
+        for candidate in candidates:
+            code = normalize_code(candidate)
+            if code in trie:
+                inc("ocr_lexicon_total", result="exact")
+                return code, confidence
+
+        digits = "".join(runs)
+        best: Dict[str, float] = {}
+        for candidate in candidates:
+            if digit_confidences is not None and candidate == digits and len(digit_confidences) == len(digits):
+                weights = [max(0.05, float(c)) for c in digit_confidences]
+            else:
+                weights = [max(0.05, confidence)] * len(candidate)
+            for code, cost in trie.search(candidate, weights):
+                best[code] = min(cost, best.get(code, cost))
+
+        ranked = sorted(best.items(), key=lambda item: item[1])
+        if not ranked or (len(ranked) > 1 and ranked[1][1] - ranked[0][1] < 1e-6):
+            inc("ocr_lexicon_total", result="rejected")
+            return None, 0.0
+
+        code, cost = ranked[0]
+        inc("ocr_lexicon_total", result="corrected")
+        return code, confidence * (1.0 - cost / (2 * MAX_COST))
+
+    def get_info(self) -> Dict[str, Any]:
+        return {"codes": len(self.trie), "loaded_at": self.loaded_at, "refresh_interval": self.refresh_interval}
+
+
+def load_codes_from_mysql(query: str = DEFAULT_QUERY) -> List[Any]:
+    """从商品表读取编号"""
+    import pymysql
+
+    connection = pymysql.connect(
+        host=os.getenv("DB_HOST", "localhost"),
+        user=os.getenv("DB_USER", "root"),
+        password=os.getenv("DB_PASSWORD", ""),
+        database=os.getenv("DB_NAME", "warehouse_system"),
+        charset="utf8mb4",
+    )
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(query)
+            return [row[0] for row in cursor.fetchall()]
+    finally:
+        connection.close()
+
+
+def load_codes_from_file(path: str) -> List[str]:
+    """从文本文件读取编号（每行一个）"""
+    with open(path, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def create_lexicon(
+    source: str,
+    query: str = DEFAULT_QUERY,
+    refresh_interval: float = 300.0
+) -> Optional[Lexicon]:
+    """
+    按来源创建词典，依赖不可用时返回 None
+
+    Args:
+        source: "mysql" 或编号文件路径
+        query: mysql 来源的查询语句，第一列为编号
+        refresh_interval: 刷新间隔（秒）
+    """
+    if source == "mysql":
+        if not PYMYSQL_AVAILABLE:
+            logger.warning("pymysql未安装，无法从商品表加载编号词典")
+            return None
+        return Lexicon(lambda: load_codes_from_mysql(query), refresh_interval)
+
+    return Lexicon(lambda: load_codes_from_file(source), refresh_interval)
@@ -0,0 +1,128 @@
+"""
+识别流水线指标 - 各阶段耗时直方图与计数器，导出为 Prometheus 文本格式
+
+进程池模式下各工作进程分别记录，主进程通过 drain()/merge() 汇总。
+"""
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Any, Tuple, List
+
+# 阶段耗时分桶（秒）：覆盖亚毫秒级的解码到数秒级的 OCR
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# 指标定义: 名称 -> (类型, 说明, 分桶)
+METRICS: Dict[str, Tuple[str, str, Tuple[float, ...]]] = {
+    "ocr_stage_duration_seconds": ("histogram", "识别流水线各阶段耗时", LATENCY_BUCKETS),
+    "ocr_detections_per_frame": ("histogram", "每帧检测到的标签数", (0, 1, 2, 3, 5, 10, 25)),
+    "ocr_frames_total": ("counter", "已检测的帧数", ()),
+    "ocr_yolo_fallback_total": ("counter", "轮廓检测失败回退到YOLO的次数", ()),
+    "ocr_tracker_frames_total": ("counter", "跟踪模式下的帧数（result=tracked 跟踪命中 / lost 跟踪丢失后重新检测）", ()),
+    "ocr_recognitions_total": ("counter", "OCR识别次数（result=hit 识别出编号 / miss 未识别）", ()),
+    "ocr_lexicon_total": ("counter", "编号词典约束结果（result=exact 精确命中 / corrected 纠正 / rejected 拒绝）", ()),
+    "ocr_cascade_stage_total": ("counter", "级联中给出结果的阶段（kind=detect / recognize）", ()),
+}
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+class MetricsRegistry:
+    """进程内指标存储"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # (指标名, 标签) -> 计数器值 或 [分桶计数列表, 总和, 次数]
+        self._values: Dict[Tuple[str, LabelKey], Any] = {}
+
+    def observe(self, name: str, value: float, **labels):
+        buckets = METRICS[name][2]
+        key = (name, tuple(sorted(labels.items())))
+        index = bisect.bisect_left(buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * len(buckets), 0.0, 0]
+            if index < len(buckets):
+                entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def inc(self, name: str, amount: float = 1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def drain(self) -> List[Tuple[Tuple[str, LabelKey], Any]]:
+        """取出并清空当前记录，供工作进程回传主进程"""
+        with self._lock:
+            values, self._values = self._values, {}
+        return list(values.items())
+
+    def merge(self, deltas: List[Tuple[Tuple[str, LabelKey], Any]]):
+        """合并其他进程回传的记录"""
+        with self._lock:
+            for key, delta in deltas:
+                current = self._values.get(key)
+                if isinstance(delta, list):
+                    if current is None:
+                        self._values[key] = [list(delta[0]), delta[1], delta[2]]
+                    else:
+                        current[0] = [a + b for a, b in zip(current[0], delta[0])]
+                        current[1] += delta[1]
+                        current[2] += delta[2]
+                else:
+                    self._values[key] = (current or 0) + delta
+
+    def render(self) -> str:
+        """导出为 Prometheus 文本格式"""
+        with self._lock:
+            snapshot = {key: (list(v[0]), v[1], v[2]) if isinstance(v, list) else v
+                        for key, v in self._values.items()}
+
+        lines = []
+        for name, (kind, help_text, buckets) in METRICS.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for (metric, labels), value in sorted(snapshot.items()):
+                if metric != name:
+                    continue
+                if kind == "counter":
+                    lines.append(f"{name}{_format_labels(labels)} {value}")
+                    continue
+                counts, total, count = value
+                cumulative = 0
+                for bound, bucket_count in zip(buckets, counts):
+                    cumulative += bucket_count
+                    lines.append(f"{name}_bucket{_format_labels(labels + (('le', repr(float(bound))),))} {cumulative}")
+                lines.append(f"{name}_bucket{_format_labels(labels + (('le', '+Inf'),))} {count}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {total}")
+                lines.append(f"{name}_count{_format_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+
+def _format_labels(labels: LabelKey) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in labels) + "}"
+
+
+REGISTRY = MetricsRegistry()
+
+
+def observe(name: str, value: float, **labels):
+    REGISTRY.observe(name, value, **labels)
+
+
+def inc(name: str, amount: float = 1, **labels):
+    REGISTRY.inc(name, amount, **labels)
+
+
+@contextmanager
+def stage_timer(stage: str):
+    """记录代码块耗时到 ocr_stage_duration_seconds{stage=...}"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        REGISTRY.observe("ocr_stage_duration_seconds", time.perf_counter() - start, stage=stage)
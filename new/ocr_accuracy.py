@@ -0,0 +1,176 @@
+"""
+识别精度核对 - 在标注样本上对比不同精度（float32 / int8）的识别网络
+
+每种精度各创建一个 OCREngine，对同一批标签 ROI 识别，统计准确率、两种精度结果一致率、
+单张延迟与识别网络大小；int8 准确率比 float32 下降超过容差时返回非零，
+可在启用 OCR_PRECISION=int8 前后或升级 EasyOCR / torch 后运行。
+
+样本目录（裁剪好的标签 ROI）:
+    labels.csv        每行 "文件名,编号"；没有此文件时取文件名中 "_" 之前的部分作为编号（如 042_a.jpg）
+
+用法:
+    python ocr_accuracy.py --samples samples/
+    python ocr_accuracy.py --synthetic 200                    # 无标注样本时使用合成标签
+    python ocr_accuracy.py --samples samples/ --max-drop 0.01 --output accuracy_report.json
+"""
+import argparse
+import csv
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import cv2
+from loguru import logger
+
+from benchmark import generate_tag_image
+from ocr_engine import OCREngine
+from preprocessor import ImagePreprocessor
+from quantization import PRECISIONS, model_size
+
+IMAGE_SUFFIXES = (".jpg", ".jpeg", ".png", ".bmp")
+
+# (ROI, 真实编号, 样本名)
+Sample = Tuple[np.ndarray, str, str]
+
+
+def load_samples(directory: Path) -> List[Sample]:
+    """读取标注样本目录"""
+    labels_file = directory / "labels.csv"
+    if labels_file.exists():
+        with open(labels_file, encoding="utf-8", newline="") as f:
+            labels = [(row[0].strip(), row[1].strip()) for row in csv.reader(f) if len(row) >= 2]
+    else:
+        labels = [
+            (path.name, path.stem.split("_")[0])
+            for path in sorted(directory.iterdir())
+            if path.suffix.lower() in IMAGE_SUFFIXES
+        ]
+
+    samples = []
+    for name, code in labels:
+        image = cv2.imread(str(directory / name))
+        if image is None:
+            logger.warning(f"无法读取样本 {name}")
+            continue
+        samples.append((image, code.zfill(3) if code.isdigit() else code, name))
+    return samples
+
+
+def synthetic_samples(count: int, seed: int = 0) -> List[Sample]:
+    """合成标签 ROI（与基准测试相同的标签图，按真实框裁剪）"""
+    rng = np.random.default_rng(seed)
+    samples = []
+    for i in range(count):
+        code = f"{int(rng.integers(0, 1000)):03d}"
+        image, (x1, y1, x2, y2) = generate_tag_image(640, 480, code=code, seed=seed + i)
+        samples.append((image[y1:y2, x1:x2], code, f"synthetic_{i}"))
+    return samples
+
+
+def evaluate(
+    precision: str,
+    samples: List[Sample],
+    recognizer_only: bool = False,
+    use_preprocess: bool = True
+) -> Tuple[Dict[str, Any], List[Optional[str]]]:
+    """
+    用指定精度的识别网络识别全部样本
+
+    Returns:
+        (统计结果, 每个样本的识别结果)
+    """
+    engine = OCREngine(precision=precision, recognizer_only=recognizer_only)
+    if engine.reader is None:
+        raise RuntimeError(f"EasyOCR 加载失败 ({precision}): {engine.load_state}")
+
+    preprocessor = ImagePreprocessor()
+    rois = [preprocessor.preprocess_for_ocr(roi) if use_preprocess else roi for roi, _, _ in samples]
+
+    # 预热
+    engine.recognize_number_code(rois[0])
+
+    predictions, latencies = [], []
+    for roi in rois:
+        start = time.perf_counter()
+        code, _ = engine.recognize_number_code(roi)
+        latencies.append(time.perf_counter() - start)
+        predictions.append(code)
+
+    correct = sum(pred == code for pred, (_, code, _) in zip(predictions, samples))
+    arr = np.array(latencies) * 1000
+    stats = {
+        "accuracy": correct / len(samples),
+        "correct": correct,
+        "samples": len(samples),
+        "p50_ms": float(np.percentile(arr, 50)),
+        "p90_ms": float(np.percentile(arr, 90)),
+        "load_time": engine.load_time,
+        "recognizer_mb": model_size(engine.reader.recognizer) / 1e6,
+    }
+    return stats, predictions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="识别网络精度核对（float32 / int8）")
+    parser.add_argument("--samples", help="标注样本目录")
+    parser.add_argument("--synthetic", type=int, default=0, help="未提供样本目录时生成的合成样本数")
+    parser.add_argument("--precisions", nargs="+", choices=PRECISIONS, default=list(PRECISIONS), help="要对比的精度")
+    parser.add_argument("--recognizer-only", action="store_true", help="只识别模式（跳过 EasyOCR 文本检测）")
+    parser.add_argument("--no-preprocess", action="store_true", help="不做流水线的 OCR 预处理")
+    parser.add_argument("--max-drop", type=float, default=0.01, help="int8 相对 float32 允许的准确率下降")
+    parser.add_argument("--output", help="结果输出路径（JSON）")
+    args = parser.parse_args()
+
+    if args.samples:
+        samples = load_samples(Path(args.samples))
+    else:
+        samples = synthetic_samples(args.synthetic or 100)
+    if not samples:
+        logger.error("没有可用的样本")
+        sys.exit(2)
+
+    results: Dict[str, Dict[str, Any]] = {}
+    predictions: Dict[str, List[Optional[str]]] = {}
+    for precision in args.precisions:
+        results[precision], predictions[precision] = evaluate(
+            precision, samples, args.recognizer_only, not args.no_preprocess
+        )
+
+    print(f"{'precision':<12}{'accuracy':>10}{'p50 ms':>10}{'p90 ms':>10}{'size MB':>10}{'load s':>10}")
+    for precision, stats in results.items():
+        print(
+            f"{precision:<12}{stats['accuracy']:>10.1%}{stats['p50_ms']:>10.2f}{stats['p90_ms']:>10.2f}"
+            f"{stats['recognizer_mb']:>10.1f}{stats['load_time']:>10.2f}"
+        )
+
+    report: Dict[str, Any] = {"samples": len(samples), "results": results}
+    failed = False
+    if "fp32" in results and "int8" in results:
+        disagreements = [
+            {"sample": name, "label": code, "fp32": a, "int8": b}
+            for (_, code, name), a, b in zip(samples, predictions["fp32"], predictions["int8"])
+            if a != b
+        ]
+        report["agreement"] = 1 - len(disagreements) / len(samples)
+        report["disagreements"] = disagreements
+        print(f"int8 与 fp32 结果一致率: {report['agreement']:.1%}")
+        for item in disagreements[:20]:
+            print(f"  {item['sample']}: 标注 {item['label']}  fp32 {item['fp32']}  int8 {item['int8']}")
+
+        drop = results["fp32"]["accuracy"] - results["int8"]["accuracy"]
+        failed = drop > args.max_drop
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+        logger.info(f"结果已写入 {args.output}")
+
+    if failed:
+        logger.error(f"int8 准确率下降 {drop:.1%}，超出容差 {args.max_drop:.1%}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,42 +1,134 @@
 """
 EasyOCR 数字识别引擎 - 稳定版
 """
+import importlib.util
 import re
+import threading
+import time
 import cv2
 import numpy as np
-from typing import Optional, Tuple
+from typing import Any, Dict, Optional, Tuple, List
 from loguru import logger
 
-try:
-    import easyocr
-    EASYOCR_AVAILABLE = True
-except ImportError:
-    EASYOCR_AVAILABLE = False
+from metrics import stage_timer, inc
+from quantization import PRECISIONS
+
+# 只检查是否安装，easyocr/torch 在首次创建 Reader 时才导入
+EASYOCR_AVAILABLE = importlib.util.find_spec("easyocr") is not None
+if not EASYOCR_AVAILABLE:
     logger.warning("EasyOCR未安装")
 
+# 只识别模式下的字符白名单
+DIGIT_ALLOWLIST = "0123456789"
+
+# 识别后端: EasyOCR 深度模型 / 连通域切分 + 模板最近邻的轻量数字分类器
+OCR_BACKENDS = ("easyocr", "digits")
+
+# 批量识别时补齐后的画布面积最多为组内每张ROI面积的倍数；尺寸差异更大的ROI分到其他组或单独识别
+LETTERBOX_MAX_PAD = 1.5
+
 
 class OCREngine:
     """OCR识别引擎 - 使用EasyOCR"""
     
-    def __init__(self, use_gpu: bool = False):
+    def __init__(
+        self,
+        use_gpu: bool = False,
+        lazy: bool = False,
+        recognizer_only: bool = False,
+        backend: str = "easyocr",
+        lexicon: Optional[Dict[str, Any]] = None,
+        precision: Optional[str] = None
+    ):
+        """
+        Args:
+            use_gpu: 是否使用GPU
+            lazy: 延迟到首次识别时再创建 EasyOCR Reader
+            recognizer_only: 只识别模式，输入已是检测器裁剪好的ROI，跳过 EasyOCR 的 CRAFT 文本检测，
+                整张ROI直接送入识别网络，只解码数字（贪心解码）
+            backend: 识别后端 easyocr / digits；digits 不加载 EasyOCR 与 torch
+            lexicon: 编号词典配置（create_lexicon 的参数），设置后识别结果约束到词典中的有效编号
+            precision: 识别网络精度 fp32 / int8（仅 CPU，量化结果缓存到 models/），
+                默认沿用 EasyOCR 自身的行为
+        """
+        if backend not in OCR_BACKENDS:
+            raise ValueError(f"不支持的识别后端: {backend}")
+        if precision is not None and precision not in PRECISIONS:
+            raise ValueError(f"不支持的识别精度: {precision}")
+        
         self.reader = None
-        self.use_easyocr = EASYOCR_AVAILABLE
+        self.use_gpu = use_gpu
+        self.recognizer_only = recognizer_only
+        self.backend = backend
+        self.precision = precision
+        self.use_easyocr = EASYOCR_AVAILABLE and backend == "easyocr"
+        self.digit_classifier = None
+        self.lexicon = None
+        if lexicon:
+            from lexicon import create_lexicon
+            self.lexicon = create_lexicon(**lexicon)
         
-        if EASYOCR_AVAILABLE:
-            try:
-                # 初始化EasyOCR，只识别英文和数字
-                self.reader = easyocr.Reader(['en'], gpu=use_gpu, verbose=False)
-                logger.info(f"✅ EasyOCR初始化成功")
-            except Exception as e:
-                logger.error(f"EasyOCR初始化失败: {e}")
-                self.use_easyocr = False
+        # 加载状态: pending / loading / ready / failed / unavailable / disabled
+        if backend != "easyocr":
+            self.load_state = "disabled"
+        else:
+            self.load_state = "pending" if EASYOCR_AVAILABLE else "unavailable"
+        self.load_time = 0.0
+        
+        # 每个线程复用一个 CLAHE 对象（apply 会使用对象内部缓冲区）
+        self._local = threading.local()
+        
+        if backend == "digits":
+            from digit_classifier import get_classifier
+            self.digit_classifier = get_classifier()
+        elif EASYOCR_AVAILABLE and not lazy:
+            self.load_reader()
+    
+    def load_reader(self) -> bool:
+        """创建EasyOCR Reader，已创建或不可用时直接返回"""
+        if self.reader is not None:
+            return True
+        if not self.use_easyocr:
+            return False
+        
+        self.load_state = "loading"
+        start = time.time()
+        
+        try:
+            import easyocr
+            
+            # 初始化EasyOCR，只识别英文和数字；只识别模式不加载 CRAFT 检测模型
+            if self.precision == "int8" and not self.use_gpu:
+                from quantization import load_quantized_reader
+                self.reader = load_quantized_reader(['en'], detector=not self.recognizer_only)
+            else:
+                options = {"quantize": False} if self.precision == "fp32" else {}
+                self.reader = easyocr.Reader(
+                    ['en'], gpu=self.use_gpu, detector=not self.recognizer_only, verbose=False, **options
+                )
+            self.load_state = "ready"
+            logger.info(f"✅ EasyOCR初始化成功")
+        except Exception as e:
+            logger.error(f"EasyOCR初始化失败: {e}")
+            self.use_easyocr = False
+            self.load_state = "failed"
+        finally:
+            self.load_time = time.time() - start
+        
+        return self.reader is not None
     
-    def recognize(self, image: np.ndarray) -> Tuple[Optional[str], float]:
+    def recognize(
+        self,
+        image: np.ndarray,
+        regions: Optional[List[List[int]]] = None
+    ) -> Tuple[Optional[str], float]:
         """
         识别图像中的数字
         
         Args:
-            image: BGR格式图像
+            image: BGR格式图像或单通道灰度图
+            regions: 只识别模式下要识别的文字区域 [[x_min, x_max, y_min, y_max], ...]，
+                默认整张图像作为一个区域
             
         Returns:
             Tuple[str, float]: (识别结果, 置信度) 或 (None, 0.0)
@@ -44,8 +136,18 @@ class OCREngine:
         if image is None or image.size == 0:
             return None, 0.0
         
-        if self.use_easyocr and self.reader is not None:
-            return self._recognize_with_easyocr(image)
+        if self.backend == "digits":
+            code, confidence, _ = self.recognize_digits(image)
+            inc("ocr_recognitions_total", result="hit" if code else "miss")
+            return code, confidence
+        
+        if self.use_easyocr and self.load_reader():
+            if self.recognizer_only:
+                code, confidence = self._recognize_digits(image, regions)
+            else:
+                code, confidence = self._recognize_with_easyocr(image)
+            inc("ocr_recognitions_total", result="hit" if code else "miss")
+            return code, confidence
         else:
             return None, 0.0
     
@@ -53,35 +155,88 @@ class OCREngine:
         """使用EasyOCR识别"""
         try:
             # EasyOCR识别
-            results = self.reader.readtext(image)
-            
-            texts = []
-            confidences = []
-            
-            # 解析结果 - 格式: [(box, text, conf), ...]
-            for (bbox, text, conf) in results:
-                texts.append(text)
-                confidences.append(conf)
-            
-            if not texts:
-                return None, 0.0
-            
-            # 合并所有文本
-            full_text = ' '.join(texts)
-            avg_conf = sum(confidences) / len(confidences) if confidences else 0.0
-            
-            # 提取数字编号
-            number = self._extract_number(full_text)
-            
-            if number:
-                return number, avg_conf
+            with stage_timer("readtext"):
+                results = self.reader.readtext(image)
+            return self._parse_results(results)
             
+        except Exception as e:
+            logger.error(f"EasyOCR识别失败: {e}")
             return None, 0.0
+    
+    def recognize_digits(self, image: np.ndarray) -> Tuple[Optional[str], float, List[float]]:
+        """
+        使用轻量数字分类器识别
+        
+        Returns:
+            (识别结果, 整体置信度, 每个数字的置信度)；整体置信度取最低的单个数字置信度，
+            调用方可据此将低置信度读数交给 EasyOCR 复核
+        """
+        if self.digit_classifier is None:
+            from digit_classifier import get_classifier
+            self.digit_classifier = get_classifier()
+        
+        with stage_timer("classify_digits"):
+            text, digit_confidences = self.digit_classifier.classify(image)
+        
+        number, confidence = self._to_code(text, min(digit_confidences, default=0.0), digit_confidences)
+        return number, confidence, digit_confidences
+    
+    def _recognize_digits(
+        self,
+        image: np.ndarray,
+        regions: Optional[List[List[int]]] = None
+    ) -> Tuple[Optional[str], float]:
+        """只运行识别网络：不做文本检测，字符集限定为数字，贪心解码"""
+        try:
+            with stage_timer("recognize_digits"):
+                results = self.reader.recognize(
+                    image,
+                    horizontal_list=regions,
+                    free_list=[] if regions else None,
+                    decoder="greedy",
+                    allowlist=DIGIT_ALLOWLIST,
+                )
+            return self._parse_results(results)
             
         except Exception as e:
             logger.error(f"EasyOCR识别失败: {e}")
             return None, 0.0
     
+    def _parse_results(self, results: list) -> Tuple[Optional[str], float]:
+        """解析EasyOCR结果并提取数字编号"""
+        texts = []
+        confidences = []
+        
+        # 解析结果 - 格式: [(box, text, conf), ...]
+        for (bbox, text, conf) in results:
+            texts.append(text)
+            confidences.append(conf)
+        
+        if not texts:
+            return None, 0.0
+        
+        # 合并所有文本
+        full_text = ' '.join(texts)
+        avg_conf = sum(confidences) / len(confidences) if confidences else 0.0
+        
+        # 提取数字编号
+        return self._to_code(full_text, avg_conf)
+    
+    def _to_code(
+        self,
+        text: str,
+        confidence: float,
+        digit_confidences: Optional[List[float]] = None
+    ) -> Tuple[Optional[str], float]:
+        """识别文本转为编号：启用词典且已加载时约束到有效编号，否则按规则提取"""
+        if self.lexicon is not None and len(self.lexicon):
+            return self.lexicon.constrain(text, confidence, digit_confidences)
+        
+        number = self._extract_number(text)
+        if number:
+            return number, confidence
+        return None, 0.0
+    
     def _extract_number(self, text: str) -> Optional[str]:
         """
         从文本中提取数字编号
@@ -111,6 +266,38 @@ class OCREngine:
         
         return None
     
+    def _clahe(self) -> cv2.CLAHE:
+        clahe = getattr(self._local, "clahe", None)
+        if clahe is None:
+            clahe = self._local.clahe = cv2.createCLAHE(clipLimit=3.0, tileGridSize=(8, 8))
+        return clahe
+    
+    @staticmethod
+    def _is_binary(gray: np.ndarray) -> bool:
+        """单通道图像是否只含 0 和 255（已二值化）"""
+        return cv2.countNonZero(cv2.inRange(gray, 1, 254)) == 0
+    
+    def _enhance(self, image: np.ndarray) -> np.ndarray:
+        """识别前预处理：小图放大、增强对比度"""
+        # 放大2倍
+        h, w = image.shape[:2]
+        if h < 50 or w < 50:
+            scale = max(100 / h, 100 / w)
+            image = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_CUBIC)
+        
+        # 单通道输入：已二值化的不再增强，灰度图直接做 CLAHE，不经过 LAB 转换
+        if image.ndim == 2:
+            if self._is_binary(image):
+                return image
+            return self._clahe().apply(image)
+        
+        # 增强对比度
+        lab = cv2.cvtColor(image, cv2.COLOR_BGR2LAB)
+        l, a, b = cv2.split(lab)
+        l = self._clahe().apply(l)
+        lab = cv2.merge([l, a, b])
+        return cv2.cvtColor(lab, cv2.COLOR_LAB2BGR)
+    
     def recognize_number_code(self, image: np.ndarray) -> Tuple[Optional[str], float]:
         """
         识别数字编号（专用接口）
@@ -119,24 +306,111 @@ class OCREngine:
         if image is None:
             return None, 0.0
         
+        # 数字分类器自行二值化并归一化字形，不需要放大与对比度增强
+        if self.backend == "digits":
+            return self.recognize(image)
+        
         # 预处理：放大、增强对比度
         try:
-            # 放大2倍
-            h, w = image.shape[:2]
-            if h < 50 or w < 50:
-                scale = max(100 / h, 100 / w)
-                image = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_CUBIC)
-            
-            # 增强对比度
-            lab = cv2.cvtColor(image, cv2.COLOR_BGR2LAB)
-            l, a, b = cv2.split(lab)
-            clahe = cv2.createCLAHE(clipLimit=3.0, tileGridSize=(8, 8))
-            l = clahe.apply(l)
-            lab = cv2.merge([l, a, b])
-            enhanced = cv2.cvtColor(lab, cv2.COLOR_LAB2BGR)
-            
+            enhanced = self._enhance(image)
             return self.recognize(enhanced)
             
         except Exception as e:
             logger.warning(f"预处理失败，使用原图: {e}")
             return self.recognize(image)
+    
+    def recognize_number_codes(self, images: List[np.ndarray]) -> List[Tuple[Optional[str], float]]:
+        """
+        批量识别数字编号
+        所有ROI补齐到同一尺寸后一次送入EasyOCR，结果按输入顺序返回
+        """
+        results: List[Tuple[Optional[str], float]] = [(None, 0.0)] * len(images)
+        
+        if self.backend == "digits":
+            return [self.recognize(image) for image in images]
+        
+        if not (self.use_easyocr and self.load_reader()):
+            return results
+        
+        indices = []
+        batch = []
+        for i, image in enumerate(images):
+            if image is None or image.size == 0:
+                continue
+            try:
+                batch.append(self._enhance(image))
+            except Exception as e:
+                logger.warning(f"预处理失败，使用原图: {e}")
+                batch.append(image)
+            indices.append(i)
+        
+        if not batch:
+            return results
+        
+        # 只识别模式没有检测阶段，逐张识别的开销已很小
+        if self.recognizer_only:
+            for j, i in enumerate(indices):
+                results[i] = self.recognize(batch[j])
+            return results
+        
+        # 尺寸相近的ROI一起补齐批量识别，避免个别大标签把整批都放大到它的尺寸；单独成组的逐张识别
+        for group in self._group_by_size(batch):
+            if len(group) == 1:
+                results[indices[group[0]]] = self.recognize(batch[group[0]])
+                continue
+            
+            images_in_group = [batch[j] for j in group]
+            try:
+                with stage_timer("readtext_batched"):
+                    batch_results = self.reader.readtext_batched(
+                        self._letterbox_batch(images_in_group), batch_size=len(group)
+                    )
+            except Exception as e:
+                logger.error(f"EasyOCR批量识别失败，逐张识别: {e}")
+                batch_results = None
+            
+            for k, j in enumerate(group):
+                if batch_results is None:
+                    results[indices[j]] = self.recognize(batch[j])
+                else:
+                    results[indices[j]] = self._parse_results(batch_results[k])
+                    inc("ocr_recognitions_total", result="hit" if results[indices[j]][0] else "miss")
+        
+        return results
+    
+    @staticmethod
+    def _group_by_size(images: List[np.ndarray], max_pad: float = LETTERBOX_MAX_PAD) -> List[List[int]]:
+        """
+        按面积从小到大贪心分组：补齐后的画布（组内最大高 × 最大宽）不超过组内最小ROI面积的 max_pad 倍
+
+        Returns:
+            每组的图像下标
+        """
+        order = sorted(range(len(images)), key=lambda i: images[i].shape[0] * images[i].shape[1])
+        groups: List[List[int]] = []
+        max_h = max_w = min_area = 0
+        for i in order:
+            h, w = images[i].shape[:2]
+            if groups and max(max_h, h) * max(max_w, w) <= max_pad * min_area:
+                groups[-1].append(i)
+                max_h, max_w = max(max_h, h), max(max_w, w)
+            else:
+                groups.append([i])
+                max_h, max_w, min_area = h, w, h * w
+        return groups
+    
+    @staticmethod
+    def _letterbox_batch(images: List[np.ndarray]) -> List[np.ndarray]:
+        """将图像以白色背景补齐到同一尺寸（不缩放，保持字形比例）；全部为单通道时保持单通道"""
+        max_h = max(img.shape[0] for img in images)
+        max_w = max(img.shape[1] for img in images)
+        gray = all(img.ndim == 2 for img in images)
+        
+        padded = []
+        for img in images:
+            if img.ndim == 2 and not gray:
+                img = cv2.cvtColor(img, cv2.COLOR_GRAY2BGR)
+            canvas = np.full((max_h, max_w) if gray else (max_h, max_w, 3), 255, dtype=np.uint8)
+            canvas[:img.shape[0], :img.shape[1]] = img
+            padded.append(canvas)
+        return padded
@@ -2,20 +2,29 @@
 OCR 识别服务 - FastAPI 后端
 整合 detector, preprocessor, ocr_engine, vote_confirmer 模块
 """
-from fastapi import FastAPI, File, UploadFile, HTTPException
+from fastapi import FastAPI, File, UploadFile, HTTPException, WebSocket, WebSocketDisconnect, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 from pydantic import BaseModel
 from typing import Optional, List, Dict, Any
-import numpy as np
-import cv2
-import io
+import asyncio
+import os
+import time
+import uuid
 import uvicorn
 
 # 导入自定义模块
-from detector import NumberDetector
-from preprocessor import ImagePreprocessor
-from ocr_engine import OCREngine
-from vote_confirmer import VoteConfirmer
+from pipeline import (
+    PipelineExecutor, init_components, recognize_bytes, recognize_batch_bytes, recognize_frame, track_frame,
+    detect_bytes
+)
+from detector import TagTracker
+from cascade import CascadePolicy
+from engine_pool import plan_pool
+from vote_confirmer import VoteRegistry
+from result_cache import ResultCache
+import metrics
+from metrics import stage_timer
 
 app = FastAPI(title="OCR 数字识别服务", version="1.0.0")
 
@@ -28,11 +37,127 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# 初始化组件
-detector = NumberDetector(confidence=0.5)
-preprocessor = ImagePreprocessor()
-ocr_engine = OCREngine(use_gpu=False)
-vote_confirmer = VoteConfirmer(window_size=5, threshold=0.6)
+# 识别工作进程数（0 表示在本进程的后台线程中执行，auto 表示按可用核数与 OCR_POOL_MODE 计算）
+# OCR_POOL_MODE: latency（少实例多线程）/ balanced / throughput（每核一个单线程实例）
+# 每个实例的线程预算默认为 核数 // 实例数，可用 OCR_THREADS_PER_WORKER 覆盖
+OCR_POOL_MODE = os.getenv("OCR_POOL_MODE", "balanced")
+_ocr_workers = os.getenv("OCR_WORKERS", "0")
+OCR_WORKERS, OCR_THREADS = plan_pool(OCR_POOL_MODE, None if _ocr_workers == "auto" else int(_ocr_workers))
+OCR_THREADS = int(os.getenv("OCR_THREADS_PER_WORKER", "0")) or OCR_THREADS
+
+# pre-fork 模式：主进程加载模型后 fork 出 OCR_WORKERS 个服务进程（见 prefork.py），模型内存写时复制共享；
+# 服务进程处理的请求数达到 OCR_PREFORK_MAX_REQUESTS 或私有内存超过 OCR_PREFORK_MAX_RSS_MB 时由主进程回收
+OCR_PREFORK = os.getenv("OCR_PREFORK", "false").lower() == "true"
+OCR_PREFORK_MAX_REQUESTS = int(os.getenv("OCR_PREFORK_MAX_REQUESTS", "0"))
+OCR_PREFORK_MAX_RSS_MB = float(os.getenv("OCR_PREFORK_MAX_RSS_MB", "0"))
+
+# 延迟加载模型（首次使用时才导入 ultralytics/easyocr），以及启动后是否后台预热
+OCR_LAZY_INIT = os.getenv("OCR_LAZY_INIT", "false").lower() == "true"
+OCR_WARMUP = os.getenv("OCR_WARMUP", "false").lower() == "true"
+
+# 检测器选项
+DETECTOR_OPTIONS: Dict[str, Any] = {
+    # 大图检测时缩小到的最大边长（0 表示在原图上检测）
+    "detect_max_side": int(os.getenv("OCR_DETECT_MAX_SIDE", "0")) or None,
+    # YOLO 推理后端: torch / onnx
+    "backend": os.getenv("OCR_YOLO_BACKEND", "torch"),
+    # onnx 后端使用 int8 量化模型
+    "int8": os.getenv("OCR_YOLO_INT8", "false").lower() == "true",
+}
+
+# OCR 引擎选项
+OCR_OPTIONS: Dict[str, Any] = {
+    # 只识别模式：跳过 EasyOCR 文本检测，整张ROI只按数字识别
+    "recognizer_only": os.getenv("OCR_RECOGNIZER_ONLY", "false").lower() == "true",
+    # 识别后端: easyocr / digits（连通域切分 + 模板最近邻，不加载 torch）
+    "backend": os.getenv("OCR_ENGINE_BACKEND", "easyocr"),
+    # 识别网络精度: fp32 / int8（CPU 上 LSTM 与线性层动态量化，结果缓存到 models/），未设置时沿用 EasyOCR 默认
+    "precision": os.getenv("OCR_PRECISION") or None,
+}
+
+# 编号词典：OCR_LEXICON=mysql 从商品表加载（OCR_LEXICON_QUERY 为查询语句），或为每行一个编号的文件路径
+if os.getenv("OCR_LEXICON"):
+    OCR_OPTIONS["lexicon"] = {
+        "source": os.getenv("OCR_LEXICON"),
+        "query": os.getenv("OCR_LEXICON_QUERY", "SELECT code FROM products WHERE code IS NOT NULL"),
+        "refresh_interval": float(os.getenv("OCR_LEXICON_REFRESH", "300")),
+    }
+
+# 置信度门控级联（两者都未设置时保持固定的 轮廓 → YOLO 检测与单一识别后端）
+# 格式为逗号分隔的 "阶段:阈值"，如 OCR_CASCADE=digits:0.8,easyocr:0.5,denoise
+CASCADE: Optional[CascadePolicy] = None
+if os.getenv("OCR_CASCADE") or os.getenv("OCR_DETECT_CASCADE"):
+    CASCADE = CascadePolicy.parse(os.getenv("OCR_DETECT_CASCADE"), os.getenv("OCR_CASCADE"))
+    CASCADE.check_backend(OCR_OPTIONS["backend"])
+
+# 上传的大 JPEG 缩小解码后再检测，解码后最长边不小于此值（0 表示按原尺寸解码）
+OCR_REDUCED_DECODE_SIDE = int(os.getenv("OCR_REDUCED_DECODE_SIDE", "0"))
+
+# 视频流默认启用标签跟踪，及跟踪模式下强制完整检测的间隔帧数
+OCR_WS_TRACK = os.getenv("OCR_WS_TRACK", "false").lower() == "true"
+OCR_TRACK_REDETECT_INTERVAL = int(os.getenv("OCR_TRACK_REDETECT_INTERVAL", "10"))
+
+# 初始化组件（检测器与 OCR 引擎由执行器在启动时加载）
+executor: Optional[PipelineExecutor] = None
+warmup_status: Dict[str, Any] = {"state": "pending" if OCR_WARMUP else "disabled", "workers": []}
+vote_registry = VoteRegistry(
+    max_sessions=int(os.getenv("VOTE_MAX_SESSIONS", "1000")),
+    idle_ttl=float(os.getenv("VOTE_SESSION_TTL", "300")),
+    window_size=5,
+    threshold=0.6
+)
+
+# 识别结果缓存（OCR_CACHE_SIZE=0 禁用）
+result_cache = ResultCache(max_entries=int(os.getenv("OCR_CACHE_SIZE", "1024")))
+
+# 未指定 session_id 时使用的默认会话
+DEFAULT_SESSION = "default"
+
+
+@app.on_event("startup")
+async def start_executor():
+    global executor
+    executor = PipelineExecutor(
+        # pre-fork 的服务进程直接使用主进程加载好的组件
+        workers=0 if OCR_PREFORK else OCR_WORKERS,
+        confidence=0.5,
+        use_gpu=False,
+        lazy=OCR_LAZY_INIT,
+        detector_options=DETECTOR_OPTIONS,
+        reduced_decode_side=OCR_REDUCED_DECODE_SIDE or None,
+        ocr_options=OCR_OPTIONS,
+        cascade=CASCADE,
+        threads=OCR_THREADS,
+        preloaded=OCR_PREFORK
+    )
+    if OCR_WARMUP:
+        asyncio.create_task(_run_warm_up())
+
+
+async def _run_warm_up():
+    """后台预热每个工作进程（每个进程恰好一次），服务在此期间可正常响应健康检查"""
+    warmup_status["state"] = "running"
+    start = time.time()
+    try:
+        warmup_status["workers"] = await executor.warm_up()
+        warmup_status["state"] = "done"
+    except Exception as e:
+        warmup_status["state"] = "failed"
+        warmup_status["error"] = str(e)
+    warmup_status["time"] = time.time() - start
+
+
+@app.on_event("shutdown")
+def stop_executor():
+    if executor is not None:
+        executor.shutdown()
+
+
+class TagResult(BaseModel):
+    code: Optional[str]
+    confidence: float
+    bbox: List[int]
+    stage: Optional[Dict[str, Optional[str]]] = None
 
 
 class OCRResult(BaseModel):
@@ -40,6 +165,9 @@ class OCRResult(BaseModel):
     confidence: float
     bbox: Optional[List[int]]
     message: str
+    tags: Optional[List[TagResult]] = None
+    # 级联模式下给出结果的阶段: {"detect": "contour", "recognize": "digits"}
+    stage: Optional[Dict[str, Optional[str]]] = None
 
 
 class OCRBatchResult(BaseModel):
@@ -58,70 +186,115 @@ def root():
             "preprocessor": True,
             "ocr_engine": True,
             "vote_confirmer": True
-        }
+        },
+        "workers": OCR_WORKERS,
+        "prefork": {"pid": os.getpid()} if OCR_PREFORK else None,
+        "pool": executor.stats() if executor else None,
+        "cascade": CASCADE.describe() if CASCADE else None
     }
 
 
+def _cache_key(contents: bytes, use_preprocess: bool, multi: bool, fused: bool) -> str:
+    """/recognize 与 /recognize/batch 共用的结果缓存键"""
+    return result_cache.make_key(contents, use_preprocess=use_preprocess, multi=multi, fused=fused)
+
+
+async def _recognize_cached(
+    contents: bytes,
+    use_preprocess: bool,
+    multi: bool = False,
+    fused: bool = False
+) -> Dict[str, Any]:
+    """先查结果缓存，未命中时在执行器中识别并写入缓存"""
+    cache_key = _cache_key(contents, use_preprocess, multi, fused)
+    result = result_cache.get(cache_key)
+    if result is None:
+        result = await executor.run(recognize_bytes, contents, use_preprocess, multi, fused)
+        if result["status"] != "decode_error":
+            result_cache.put(cache_key, result)
+    return result
+
+
+@app.get("/ready")
+async def readiness():
+    """就绪检查：报告各实例组件的加载状态与耗时，预热未完成时返回 503"""
+    # 读取各实例报告的状态，不排在识别任务之后
+    components = executor.component_status()
+    loading = any(status[name]["state"] == "loading" for status in components for name in ("yolo", "easyocr"))
+    ready = warmup_status["state"] in ("done", "disabled") and not loading
+    
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={
+            "ready": ready,
+            "lazy_init": OCR_LAZY_INIT,
+            "warmup": warmup_status,
+            "components": components
+        }
+    )
+
+
 @app.post("/recognize", response_model=OCRResult)
 async def recognize_image(
     image: UploadFile = File(...),
     use_preprocess: bool = True,
-    use_vote: bool = False
+    use_vote: bool = False,
+    session_id: str = DEFAULT_SESSION,
+    multi: bool = False,
+    fused: bool = False
 ):
     """
     识别图像中的数字编号
     
     - use_preprocess: 是否使用图像预处理
     - use_vote: 是否使用多帧投票（用于视频流）
+    - session_id: 投票会话ID，每个摄像头/客户端使用独立的投票窗口
+    - multi: 识别所有检测到的标签，结果列表在 tags 中返回（投票只使用主结果）
+    - fused: 单通道融合流水线，从解码到识别全程使用灰度图，二值化后跳过对比度增强
     """
     try:
-        # 读取图像
+        # 读取图像，检测、预处理和 OCR 在执行器中完成
         contents = await image.read()
-        nparr = np.frombuffer(contents, np.uint8)
-        img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        result = await _recognize_cached(contents, use_preprocess, multi, fused)
         
-        if img is None:
+        if result["status"] == "decode_error":
             raise HTTPException(status_code=400, detail="无法读取图像文件")
         
-        # 1. 检测数字标签区域
-        detections = detector.detect_and_crop(img)
-        
-        if not detections:
+        if result["status"] == "no_detection":
             return OCRResult(
                 code=None,
                 confidence=0.0,
                 bbox=None,
-                message="未检测到数字标签"
+                message="未检测到数字标签",
+                tags=result.get("tags")
             )
         
-        # 取第一个检测结果（通常是最大的）
-        det = detections[0]
-        roi = det["roi"]
-        bbox = det["bbox"]
-        
-        # 2. 预处理（可选）
-        if use_preprocess:
-            roi = preprocessor.preprocess_for_ocr(roi)
-        
-        # 3. OCR 识别
-        code, confidence = ocr_engine.recognize_number_code(roi)
+        code = result["code"]
+        confidence = result["confidence"]
+        bbox = result["bbox"]
         
         # 4. 多帧投票（可选，用于视频流）
         if use_vote:
-            vote_result = vote_confirmer.add_result(code, confidence)
+            with stage_timer("vote"):
+                vote_confirmer = vote_registry.get(session_id)
+                vote_result = vote_confirmer.add_result(code, confidence)
             if vote_result:
                 return OCRResult(
                     code=vote_result["code"],
                     confidence=vote_result["confidence"],
                     bbox=bbox,
-                    message=f"投票确认成功 ({vote_result['votes']}/5)"
+                    message=f"投票确认成功 ({vote_result['votes']}/{vote_confirmer.window_size})",
+                    tags=result.get("tags"),
+                    stage=result.get("stage")
                 )
             else:
                 return OCRResult(
                     code=None,
                     confidence=confidence,
                     bbox=bbox,
-                    message="投票中，请继续提供图像"
+                    message="投票中，请继续提供图像",
+                    tags=result.get("tags"),
+                    stage=result.get("stage")
                 )
         
         if code:
@@ -129,78 +302,112 @@ async def recognize_image(
                 code=code,
                 confidence=confidence,
                 bbox=bbox,
-                message="识别成功"
+                message="识别成功",
+                tags=result.get("tags"),
+                stage=result.get("stage")
             )
         else:
             return OCRResult(
                 code=None,
                 confidence=confidence,
                 bbox=bbox,
-                message="未能识别数字"
+                message="未能识别数字",
+                tags=result.get("tags"),
+                stage=result.get("stage")
             )
             
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"识别失败: {str(e)}")
 
 
 @app.post("/recognize/batch", response_model=OCRBatchResult)
-async def recognize_batch(images: List[UploadFile] = File(...)):
-    """批量识别多张图像"""
+async def recognize_batch(
+    images: List[UploadFile] = File(...),
+    use_preprocess: bool = True,
+    multi: bool = False,
+    fused: bool = False
+):
+    """
+    批量识别多张图像
+    
+    图像按工作进程数分块，每块在一个工作进程中并行解码、
+    收集全部ROI后一次批量识别；use_preprocess / multi / fused 与 /recognize 相同，
+    两个接口共用结果缓存
+    """
+    contents_list = [await image.read() for image in images]
+    
+    # 缓存命中的图像直接取结果，只识别未命中的部分
+    cache_keys = [_cache_key(contents, use_preprocess, multi, fused) for contents in contents_list]
+    outcomes: List[Any] = [result_cache.get(key) for key in cache_keys]
+    pending = [i for i, outcome in enumerate(outcomes) if outcome is None]
+    
+    chunk_count = max(1, min(executor.workers, len(pending)))
+    chunk_size = -(-len(pending) // chunk_count) if pending else 1
+    chunks = [pending[i:i + chunk_size] for i in range(0, len(pending), chunk_size)]
+    
+    chunk_outcomes = await asyncio.gather(
+        *(
+            executor.run(recognize_batch_bytes, [contents_list[i] for i in chunk], use_preprocess, multi, fused)
+            for chunk in chunks
+        ),
+        return_exceptions=True
+    )
+    
+    for chunk, chunk_outcome in zip(chunks, chunk_outcomes):
+        for j, index in enumerate(chunk):
+            if isinstance(chunk_outcome, BaseException):
+                outcomes[index] = chunk_outcome
+                continue
+            outcomes[index] = chunk_outcome[j]
+            if chunk_outcome[j]["status"] != "decode_error":
+                result_cache.put(cache_keys[index], chunk_outcome[j])
+    
     results = []
     successful = 0
     
-    for image in images:
-        try:
-            contents = await image.read()
-            nparr = np.frombuffer(contents, np.uint8)
-            img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-            
-            if img is None:
-                results.append(OCRResult(
-                    code=None,
-                    confidence=0.0,
-                    bbox=None,
-                    message="无法读取图像"
-                ))
-                continue
-            
-            # 检测并识别
-            detections = detector.detect_and_crop(img)
-            if not detections:
-                results.append(OCRResult(
-                    code=None,
-                    confidence=0.0,
-                    bbox=None,
-                    message="未检测到数字标签"
-                ))
-                continue
-            
-            det = detections[0]
-            roi = preprocessor.preprocess_for_ocr(det["roi"])
-            code, confidence = ocr_engine.recognize_number_code(roi)
-            
-            if code:
-                successful += 1
-                results.append(OCRResult(
-                    code=code,
-                    confidence=confidence,
-                    bbox=det["bbox"],
-                    message="识别成功"
-                ))
-            else:
-                results.append(OCRResult(
-                    code=None,
-                    confidence=confidence,
-                    bbox=det["bbox"],
-                    message="未能识别数字"
-                ))
-                
-        except Exception as e:
+    for outcome in outcomes:
+        if isinstance(outcome, BaseException):
             results.append(OCRResult(
                 code=None,
                 confidence=0.0,
                 bbox=None,
-                message=f"处理失败: {str(e)}"
+                message=f"处理失败: {str(outcome)}"
+            ))
+        elif outcome["status"] == "decode_error":
+            results.append(OCRResult(
+                code=None,
+                confidence=0.0,
+                bbox=None,
+                message="无法读取图像"
+            ))
+        elif outcome["status"] == "no_detection":
+            results.append(OCRResult(
+                code=None,
+                confidence=0.0,
+                bbox=None,
+                message="未检测到数字标签",
+                tags=outcome.get("tags")
+            ))
+        elif outcome["code"]:
+            successful += 1
+            results.append(OCRResult(
+                code=outcome["code"],
+                confidence=outcome["confidence"],
+                bbox=outcome["bbox"],
+                message="识别成功",
+                tags=outcome.get("tags"),
+                stage=outcome.get("stage")
+            ))
+        else:
+            results.append(OCRResult(
+                code=None,
+                confidence=outcome["confidence"],
+                bbox=outcome["bbox"],
+                message="未能识别数字",
+                tags=outcome.get("tags"),
+                stage=outcome.get("stage")
             ))
     
     return OCRBatchResult(
@@ -215,35 +422,204 @@ async def detect_only(image: UploadFile = File(...)):
     """仅检测数字标签区域，不进行 OCR"""
     try:
         contents = await image.read()
-        nparr = np.frombuffer(contents, np.uint8)
-        img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        detections = await executor.run(detect_bytes, contents)
         
-        if img is None:
+        if detections is None:
             raise HTTPException(status_code=400, detail="无法读取图像文件")
         
-        detections = detector.detect(img)
-        
         return {
             "detections": detections,
             "count": len(detections)
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"检测失败: {str(e)}")
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    """Prometheus 文本格式的流水线指标"""
+    cache_stats = result_cache.get_stats()
+    vote_stats = vote_registry.get_stats()
+    extra = [
+        "# HELP ocr_cache_requests_total 识别结果缓存查询次数",
+        "# TYPE ocr_cache_requests_total counter",
+        f'ocr_cache_requests_total{{result="hit"}} {cache_stats["hits"]}',
+        f'ocr_cache_requests_total{{result="miss"}} {cache_stats["misses"]}',
+        "# HELP ocr_vote_sessions 当前投票会话数",
+        "# TYPE ocr_vote_sessions gauge",
+        f"ocr_vote_sessions {vote_stats['sessions']}",
+    ]
+    return PlainTextResponse(
+        metrics.REGISTRY.render() + "\n".join(extra) + "\n",
+        media_type="text/plain; version=0.0.4"
+    )
+
+
+@app.get("/cache/stats")
+def get_cache_stats():
+    """获取识别结果缓存统计"""
+    return result_cache.get_stats()
+
+
+@app.post("/cache/clear")
+def clear_cache():
+    """清空识别结果缓存"""
+    result_cache.clear()
+    return {"message": "识别结果缓存已清空"}
+
+
 @app.get("/vote/status")
-def get_vote_status():
-    """获取投票确认器当前状态"""
-    return vote_confirmer.get_current_stats()
+def get_vote_status(session_id: str = DEFAULT_SESSION):
+    """获取指定会话的投票确认器当前状态"""
+    if session_id == DEFAULT_SESSION:
+        vote_confirmer = vote_registry.get(session_id)
+    else:
+        vote_confirmer = vote_registry.peek(session_id)
+        if vote_confirmer is None:
+            raise HTTPException(status_code=404, detail="投票会话不存在")
+    
+    return {
+        "session_id": session_id,
+        **vote_confirmer.get_current_stats(),
+        "registry": vote_registry.get_stats()
+    }
 
 
 @app.post("/vote/reset")
-def reset_vote():
-    """重置投票确认器"""
-    vote_confirmer.reset()
-    return {"message": "投票确认器已重置"}
+def reset_vote(session_id: str = DEFAULT_SESSION):
+    """重置指定会话的投票确认器"""
+    vote_registry.remove(session_id)
+    return {"message": "投票确认器已重置", "session_id": session_id}
+
+
+@app.websocket("/ws/recognize")
+async def recognize_stream(
+    websocket: WebSocket,
+    session_id: Optional[str] = None,
+    use_preprocess: bool = True,
+    track: bool = OCR_WS_TRACK
+):
+    """
+    视频流识别：客户端在同一连接上连续发送 JPEG 帧（二进制消息）
+    
+    识别跟不上时丢弃过期帧，始终处理最新一帧，延迟不随帧率累积。
+    track=true 时检测到标签后在后续帧中跟随其位置，定期或跟踪丢失时才完整检测。
+    每处理一帧推送 {"type": "result", ...}，投票确认时额外推送 {"type": "confirmed", ...}
+    """
+    await websocket.accept()
+    
+    # 未指定会话时每个连接使用独立投票窗口，断开后释放
+    own_session = session_id is None
+    session_id = session_id or f"ws-{uuid.uuid4()}"
+    
+    latest_frame: Dict[str, Any] = {"data": None, "dropped": 0}
+    frame_ready = asyncio.Event()
+    
+    async def receive_frames():
+        """接收二进制帧，只保留最新一帧；收到非二进制消息时返回，由主循环关闭连接"""
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+            data = message.get("bytes")
+            if data is None:
+                return
+            if latest_frame["data"] is not None:
+                latest_frame["dropped"] += 1
+            latest_frame["data"] = data
+            frame_ready.set()
+    
+    receiver = asyncio.create_task(receive_frames())
+    ready: Optional[asyncio.Task] = None
+    processed = 0
+    tracker = TagTracker(redetect_interval=OCR_TRACK_REDETECT_INTERVAL) if track else None
+    
+    try:
+        while True:
+            ready = asyncio.create_task(frame_ready.wait())
+            done, _ = await asyncio.wait({ready, receiver}, return_when=asyncio.FIRST_COMPLETED)
+            if receiver in done:
+                # 客户端断开时抛出 WebSocketDisconnect；正常返回表示收到了文本消息
+                receiver.result()
+                await websocket.close(code=status.WS_1003_UNSUPPORTED_DATA, reason="只接受二进制 JPEG 帧")
+                return
+            
+            frame_ready.clear()
+            data = latest_frame["data"]
+            latest_frame["data"] = None
+            
+            if tracker is not None:
+                result, tracker = await executor.run(track_frame, data, use_preprocess, tracker)
+            else:
+                result = await executor.run(recognize_frame, data, use_preprocess)
+            processed += 1
+            
+            # 持续投票期间刷新会话的访问时间
+            vote_result = None
+            with stage_timer("vote"):
+                vote_confirmer = vote_registry.get(session_id)
+                if result["status"] != "decode_error":
+                    vote_result = vote_confirmer.add_result(result["code"], result["confidence"])
+            
+            await websocket.send_json({
+                "type": "result",
+                "status": result["status"],
+                "code": result["code"],
+                "confidence": result["confidence"],
+                "bbox": result["bbox"],
+                "tracked": result.get("tracked", False),
+                "stage": result.get("stage"),
+                "processed": processed,
+                "dropped": latest_frame["dropped"]
+            })
+            
+            if vote_result:
+                await websocket.send_json({
+                    "type": "confirmed",
+                    "session_id": session_id,
+                    "bbox": result["bbox"],
+                    **vote_result
+                })
+                
+    except WebSocketDisconnect:
+        pass
+    finally:
+        # 接收任务与等待新帧的任务随连接一起结束（已完成的任务调用 cancel 无影响）
+        for task in (receiver, ready):
+            if task is not None:
+                task.cancel()
+        if own_session:
+            vote_registry.remove(session_id)
+
+
+def _preload_components():
+    """pre-fork 主进程加载全部组件（忽略 OCR_LAZY_INIT，延迟加载的模型无法在服务进程间共享）"""
+    init_components(
+        confidence=0.5,
+        use_gpu=False,
+        lazy=False,
+        detector_options=DETECTOR_OPTIONS,
+        reduced_decode_side=OCR_REDUCED_DECODE_SIDE or None,
+        ocr_options=OCR_OPTIONS,
+        cascade=CASCADE
+    )
 
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    if OCR_PREFORK:
+        from prefork import PreforkServer
+        PreforkServer(
+            app,
+            preload=_preload_components,
+            host="0.0.0.0",
+            port=8000,
+            workers=max(1, OCR_WORKERS),
+            threads=OCR_THREADS,
+            max_requests=OCR_PREFORK_MAX_REQUESTS,
+            max_rss_mb=OCR_PREFORK_MAX_RSS_MB
+        ).run()
+    else:
+        uvicorn.run(app, host="0.0.0.0", port=8000)
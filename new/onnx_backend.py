@@ -0,0 +1,166 @@
+"""
+YOLO 的 ONNX Runtime CPU 推理后端
+
+模型只在首次使用时由 ultralytics 导出一次为 ONNX（可选 int8 动态量化），
+之后工作进程只需 onnxruntime，不再导入 torch / ultralytics。
+letterbox 预处理与输出解码均用 NumPy 完成。
+"""
+import ast
+import importlib.util
+import shutil
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import cv2
+from loguru import logger
+
+from nms import to_array, nms
+from engine_pool import thread_budget
+
+ONNXRUNTIME_AVAILABLE = importlib.util.find_spec("onnxruntime") is not None
+
+MODELS_DIR = Path(__file__).parent.parent / "models"
+
+
+def export_onnx(model_path: str, imgsz: int = 640, int8: bool = False) -> Path:
+    """
+    将 YOLO 模型导出为 ONNX，已导出时直接返回缓存文件
+
+    Args:
+        model_path: YOLO模型文件名（优先使用 models/ 下的自定义模型）
+        imgsz: 导出的输入尺寸
+        int8: 额外生成 int8 动态量化版本并返回其路径
+
+    Returns:
+        ONNX 模型路径（models/<名称>.onnx 或 models/<名称>.int8.onnx）
+    """
+    stem = Path(model_path).stem
+    onnx_path = MODELS_DIR / f"{stem}.onnx"
+    int8_path = MODELS_DIR / f"{stem}.int8.onnx"
+    target = int8_path if int8 else onnx_path
+
+    if target.exists():
+        return target
+
+    MODELS_DIR.mkdir(parents=True, exist_ok=True)
+
+    if not onnx_path.exists():
+        # 只有导出时需要 ultralytics / torch
+        from ultralytics import YOLO
+
+        custom_model = MODELS_DIR / model_path
+        source = str(custom_model) if custom_model.exists() else model_path
+        exported = YOLO(source).export(format="onnx", imgsz=imgsz, dynamic=False)
+        if Path(exported).resolve() != onnx_path.resolve():
+            shutil.move(str(exported), onnx_path)
+        logger.info(f"✅ YOLO模型已导出为ONNX: {onnx_path}")
+
+    if int8:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        quantize_dynamic(str(onnx_path), str(int8_path), weight_type=QuantType.QUInt8)
+        logger.info(f"✅ ONNX模型已量化为int8: {int8_path}")
+
+    return target
+
+
+class OnnxYoloBackend:
+    """ONNX Runtime 上的 YOLOv8 检测"""
+
+    def __init__(self, onnx_path: Path, iou_threshold: float = 0.7, max_det: int = 300):
+        import onnxruntime as ort
+
+        # 遵循引擎池的线程预算（未设置时由 onnxruntime 按核数决定）
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = thread_budget()
+        self.session = ort.InferenceSession(str(onnx_path), options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+        _, _, self.input_h, self.input_w = self.session.get_inputs()[0].shape
+        self.iou_threshold = iou_threshold
+        self.max_det = max_det
+
+        # ultralytics 导出时把类别名写入模型元数据: "{0: 'person', ...}"
+        metadata = self.session.get_modelmeta().custom_metadata_map
+        self.names: Dict[int, str] = ast.literal_eval(metadata["names"]) if "names" in metadata else {}
+
+        # 预分配输入缓冲区，letterbox 直接写入
+        self._canvas = np.full((self.input_h, self.input_w, 3), 114, np.uint8)
+        self._blob = np.empty((1, 3, self.input_h, self.input_w), np.float32)
+
+    def letterbox(self, image: np.ndarray) -> Tuple[np.ndarray, float, Tuple[int, int]]:
+        """
+        等比缩放并居中填充到模型输入尺寸
+
+        Returns:
+            (NCHW float32 输入, 缩放比例, (左侧填充, 顶部填充))
+        """
+        h, w = image.shape[:2]
+        ratio = min(self.input_h / h, self.input_w / w)
+        nw, nh = round(w * ratio), round(h * ratio)
+        pad_x, pad_y = (self.input_w - nw) // 2, (self.input_h - nh) // 2
+
+        self._canvas.fill(114)
+        self._canvas[pad_y:pad_y + nh, pad_x:pad_x + nw] = cv2.resize(
+            image, (nw, nh), interpolation=cv2.INTER_LINEAR
+        )
+
+        # BGR HWC uint8 -> RGB CHW float32 [0, 1]
+        np.multiply(self._canvas[..., ::-1].transpose(2, 0, 1), 1 / 255.0, out=self._blob[0], casting="unsafe")
+        return self._blob, ratio, (pad_x, pad_y)
+
+    def __call__(self, image: np.ndarray, conf: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        检测单张图像
+
+        Returns:
+            (N×4 原图坐标框 xyxy, N 置信度, N 类别编号)
+        """
+        blob, ratio, (pad_x, pad_y) = self.letterbox(image)
+        output = self.session.run(None, {self.input_name: blob})[0]
+        return self.decode(output, conf, ratio, pad_x, pad_y, image.shape[:2])
+
+    def decode(
+        self,
+        output: np.ndarray,
+        conf: float,
+        ratio: float,
+        pad_x: int,
+        pad_y: int,
+        image_shape: Tuple[int, int]
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """解码 YOLOv8 输出 (1, 4+类别数, 候选数)：置信度过滤、坐标还原、按类别 NMS"""
+        preds = output[0].T
+        class_scores = preds[:, 4:]
+        classes = class_scores.argmax(axis=1)
+        scores = class_scores[np.arange(len(classes)), classes]
+
+        mask = scores > conf
+        preds, scores, classes = preds[mask], scores[mask], classes[mask]
+        if not len(scores):
+            return np.empty((0, 4), np.float32), scores, classes
+
+        # cx, cy, w, h（letterbox 坐标）-> x1, y1, x2, y2（原图坐标）
+        cx, cy, bw, bh = preds[:, 0], preds[:, 1], preds[:, 2], preds[:, 3]
+        boxes = np.stack([cx - bw / 2 - pad_x, cy - bh / 2 - pad_y, cx + bw / 2 - pad_x, cy + bh / 2 - pad_y], axis=1)
+        boxes /= ratio
+        h, w = image_shape
+        np.clip(boxes[:, 0::2], 0, w, out=boxes[:, 0::2])
+        np.clip(boxes[:, 1::2], 0, h, out=boxes[:, 1::2])
+
+        keep, _ = nms(to_array(boxes, scores, classes), iou_threshold=self.iou_threshold, class_aware=True)
+        keep = keep[:self.max_det]
+        return boxes[keep], scores[keep], classes[keep]
+
+
+def load_backend(model_path: str, int8: bool = False) -> Optional[OnnxYoloBackend]:
+    """导出（如需要）并加载 ONNX 后端，失败时返回 None"""
+    if not ONNXRUNTIME_AVAILABLE:
+        logger.warning("onnxruntime未安装，无法使用ONNX推理后端")
+        return None
+
+    try:
+        return OnnxYoloBackend(export_onnx(model_path, int8=int8))
+    except Exception as e:
+        logger.error(f"ONNX后端加载失败: {e}")
+        return None
@@ -0,0 +1,522 @@
+"""
+识别流水线执行层 - 将 CPU 密集型步骤移出事件循环
+
+每个工作进程持有各自初始化好的检测器和 OCR 引擎，
+FastAPI 处理函数只负责 await 结果，不会被单次慢识别阻塞。
+"""
+import asyncio
+import multiprocessing
+import os
+import queue
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import cv2
+from loguru import logger
+
+import metrics
+from metrics import stage_timer
+from detector import CROP_PADDING
+from engine_pool import THREAD_ENV_VARS, apply_thread_budget
+
+# 当前进程内的组件（主进程或工作进程各一份）
+_components: Dict[str, Any] = {}
+
+# 缩小解码时，检测框在缩小图上的高度达到此值即直接从缩小图裁剪ROI，否则完整解码原图
+REDUCED_ROI_MIN_HEIGHT = 64
+
+# 进程池预热时工作进程在屏障处等待其余进程的超时（秒），预热可能包含首次下载模型
+WARMUP_BARRIER_TIMEOUT = 600.0
+
+# 工作进程的状态队列与预热屏障（由进程池初始化函数设置）
+_worker_sync: Dict[str, Any] = {}
+
+# 批量解码线程池（cv2.imdecode 会释放 GIL）
+_decode_pool: Optional[ThreadPoolExecutor] = None
+
+
+def init_components(
+    confidence: float = 0.5,
+    use_gpu: bool = False,
+    lazy: bool = False,
+    detector_options: Optional[Dict[str, Any]] = None,
+    reduced_decode_side: Optional[int] = None,
+    ocr_options: Optional[Dict[str, Any]] = None,
+    cascade: Any = None
+):
+    """
+    初始化当前进程的检测器、预处理器和 OCR 引擎
+
+    lazy=True 时只创建对象，YOLO 与 EasyOCR 模型在首次使用时才加载；
+    detector_options 为 NumberDetector 的其余参数（缩放检测、NMS、推理后端等）；
+    reduced_decode_side 不为空时上传的大 JPEG 先缩小解码再检测，解码后最长边不小于此值；
+    ocr_options 为 OCREngine 的其余参数（只识别模式等）；
+    cascade 为 CascadePolicy，设置后检测与识别都按其阶段和置信度阈值逐级升级，结果附带 stage
+    """
+    from detector import NumberDetector
+    from preprocessor import ImagePreprocessor
+    from ocr_engine import OCREngine
+
+    if cascade is not None:
+        cascade.check_backend((ocr_options or {}).get("backend", "easyocr"))
+
+    _components["detector"] = NumberDetector(
+        confidence=confidence, lazy=lazy, cascade=cascade, **(detector_options or {})
+    )
+    _components["preprocessor"] = ImagePreprocessor()
+    _components["ocr_engine"] = OCREngine(use_gpu=use_gpu, lazy=lazy, **(ocr_options or {}))
+    _components["reduced_decode_side"] = reduced_decode_side
+    _components["cascade"] = cascade
+    logger.info(f"✅ 识别组件初始化完成 (pid: {os.getpid()}, 延迟加载: {lazy})")
+
+
+def get_component(name: str) -> Any:
+    return _components[name]
+
+
+def component_status() -> Dict[str, Any]:
+    """当前进程各组件的加载状态与耗时"""
+    detector = _components["detector"]
+    ocr_engine = _components["ocr_engine"]
+    return {
+        "pid": os.getpid(),
+        "yolo": {"state": detector.load_state, "load_time": detector.load_time},
+        "easyocr": {"state": ocr_engine.load_state, "load_time": ocr_engine.load_time},
+    }
+
+
+def _synthetic_tag_image() -> np.ndarray:
+    """生成一张白底黑字数字标签图，用于预热"""
+    img = np.full((480, 640, 3), 90, np.uint8)
+    cv2.rectangle(img, (200, 180), (440, 290), (255, 255, 255), -1)
+    cv2.putText(img, "001", (230, 265), cv2.FONT_HERSHEY_SIMPLEX, 2.5, (0, 0, 0), 6)
+    return img
+
+
+def warm_up() -> Dict[str, Any]:
+    """
+    预热：加载 OCR 模型并完整跑一遍识别流程
+
+    合成标签可被轮廓检测命中，因此延迟模式下 YOLO 仍保持未加载
+    """
+    start = time.time()
+    _components["ocr_engine"].load_reader()
+    _recognize_image(_synthetic_tag_image(), use_preprocess=True)
+    return {**component_status(), "warmup_time": time.time() - start}
+
+
+def decode_image(contents: bytes, gray: bool = False) -> Optional[np.ndarray]:
+    """解码上传的图像字节，gray=True 时直接解码为单通道灰度图"""
+    with stage_timer("decode"):
+        nparr = np.frombuffer(contents, np.uint8)
+        return cv2.imdecode(nparr, cv2.IMREAD_GRAYSCALE if gray else cv2.IMREAD_COLOR)
+
+
+def decode_for_detection(contents: bytes, gray: bool = False) -> Tuple[Optional[np.ndarray], int]:
+    """
+    解码用于检测的图像
+
+    启用缩小解码时按 JPEG 头部尺寸在 DCT 域缩小解码，返回 (图像, 缩小倍数)；
+    否则按原尺寸解码，倍数为 1
+    """
+    min_side = _components["reduced_decode_side"]
+    if not min_side:
+        return decode_image(contents, gray), 1
+    with stage_timer("decode"):
+        return _components["preprocessor"].decode_reduced(contents, min_side, gray)
+
+
+def _detect_and_crop(contents: bytes, img: np.ndarray, factor: int) -> List[Dict[str, Any]]:
+    """在（可能缩小解码的）图像上检测，返回原图坐标的检测框及ROI"""
+    detector = _components["detector"]
+    if factor == 1:
+        return detector.detect_and_crop(img)
+
+    detections = detector.detect(img, source_scale=1 / factor)
+    return _crop_full_resolution(contents, img, factor, detections)
+
+
+def _crop_full_resolution(
+    contents: bytes,
+    small: np.ndarray,
+    factor: int,
+    detections: List[Dict[str, Any]]
+) -> List[Dict[str, Any]]:
+    """
+    将缩小图上的检测框映射回原图并裁剪ROI
+
+    ROI 在缩小图上已有足够高度时直接从缩小图裁剪；
+    否则才完整解码一次原图，从原分辨率裁剪
+    """
+    width, height = _components["preprocessor"].read_jpeg_size(contents)
+    full = None
+
+    results = []
+    for det in detections:
+        x1, y1, x2, y2 = map(int, det["bbox"])
+        bbox = [
+            max(0, x1 * factor - CROP_PADDING),
+            max(0, y1 * factor - CROP_PADDING),
+            min(width, x2 * factor + CROP_PADDING),
+            min(height, y2 * factor + CROP_PADDING),
+        ]
+
+        if y2 - y1 >= REDUCED_ROI_MIN_HEIGHT:
+            roi = small[bbox[1] // factor:-(-bbox[3] // factor), bbox[0] // factor:-(-bbox[2] // factor)]
+        else:
+            if full is None:
+                full = decode_image(contents, gray=small.ndim == 2)
+            roi = full[bbox[1]:bbox[3], bbox[0]:bbox[2]]
+
+        results.append({**det, "bbox": bbox, "roi": roi})
+
+    return results
+
+
+def recognize_bytes(
+    contents: bytes,
+    use_preprocess: bool = True,
+    multi: bool = False,
+    fused: bool = False
+) -> Dict[str, Any]:
+    """
+    完整识别流程：解码 → 检测 → 预处理 → OCR
+
+    multi=True 时识别所有检测到的标签，结果中附带 tags 列表；
+    fused=True 时从解码起全程使用单通道灰度图（灰度解码、单通道预处理、跳过对比度增强）
+
+    Returns:
+        {"status": "ok" | "decode_error" | "no_detection", "code", "confidence", "bbox"[, "tags"]}
+    """
+    img, factor = decode_for_detection(contents, gray=fused)
+    if img is None:
+        return {"status": "decode_error", "code": None, "confidence": 0.0, "bbox": None}
+    return _recognize_detections(_detect_and_crop(contents, img, factor), use_preprocess, multi, fused)
+
+
+def recognize_frame(jpeg_bytes: bytes, use_preprocess: bool = True) -> Dict[str, Any]:
+    """视频流单帧识别，使用预处理器的帧解码"""
+    with stage_timer("decode"):
+        img = _components["preprocessor"].decode_frame(jpeg_bytes)
+    return _recognize_image(img, use_preprocess)
+
+
+def track_frame(jpeg_bytes: bytes, use_preprocess: bool, tracker: Any) -> Tuple[Dict[str, Any], Any]:
+    """
+    跟踪模式下的视频流单帧识别
+
+    tracker 为该视频流的 TagTracker，进程池模式下随任务传入工作进程，
+    更新后随结果一起返回，由调用方保存供下一帧使用
+    """
+    with stage_timer("decode"):
+        img = _components["preprocessor"].decode_frame(jpeg_bytes)
+    tracked_before = tracker.tracked_frames
+    result = _recognize_image(img, use_preprocess, tracker=tracker)
+    result["tracked"] = tracker.tracked_frames > tracked_before
+    return result, tracker
+
+
+def _recognize_image(
+    img: Optional[np.ndarray],
+    use_preprocess: bool,
+    multi: bool = False,
+    tracker: Any = None
+) -> Dict[str, Any]:
+    """对已解码图像执行 检测 → 预处理 → OCR"""
+    if img is None:
+        return {"status": "decode_error", "code": None, "confidence": 0.0, "bbox": None}
+
+    return _recognize_detections(_components["detector"].detect_and_crop(img, tracker), use_preprocess, multi)
+
+
+def _preprocess(roi: np.ndarray, fused: bool) -> np.ndarray:
+    preprocessor = _components["preprocessor"]
+    return preprocessor.preprocess_for_ocr_gray(roi) if fused else preprocessor.preprocess_for_ocr(roi)
+
+
+def _recognize_detections(
+    detections: List[Dict[str, Any]],
+    use_preprocess: bool,
+    multi: bool = False,
+    fused: bool = False
+) -> Dict[str, Any]:
+    """对带 ROI 的检测结果执行 预处理 → OCR"""
+    if not detections:
+        result = {"status": "no_detection", "code": None, "confidence": 0.0, "bbox": None}
+        if multi:
+            result["tags"] = []
+        return result
+
+    if multi:
+        return _recognize_all(detections, use_preprocess, fused)
+
+    # 取第一个检测结果（通常是最大的）
+    det = detections[0]
+    if _components["cascade"] is not None:
+        return {"status": "ok", **_recognize_cascade(det, use_preprocess, fused)}
+
+    roi = det["roi"]
+    if use_preprocess:
+        roi = _preprocess(roi, fused)
+
+    code, confidence = _components["ocr_engine"].recognize_number_code(roi)
+    return {"status": "ok", "code": code, "confidence": confidence, "bbox": det["bbox"]}
+
+
+def _recognize_cascade(det: Dict[str, Any], use_preprocess: bool, fused: bool = False) -> Dict[str, Any]:
+    """按级联策略识别单个检测结果，附带检测与识别各由哪个阶段给出"""
+    prepare = (lambda roi: _preprocess(roi, fused)) if use_preprocess else (lambda roi: roi)
+    code, confidence, stage = _components["cascade"].recognize(_components["ocr_engine"], det["roi"], prepare)
+    return {
+        "code": code,
+        "confidence": confidence,
+        "bbox": det["bbox"],
+        "stage": {"detect": det.get("stage"), "recognize": stage},
+    }
+
+
+def _recognize_all(detections: List[Dict[str, Any]], use_preprocess: bool, fused: bool = False) -> Dict[str, Any]:
+    """识别所有检测到的标签，全部ROI一次批量送入OCR引擎（级联模式下逐个识别）"""
+    if _components["cascade"] is not None:
+        tags = [_recognize_cascade(det, use_preprocess, fused) for det in detections]
+        primary = next((tag for tag in tags if tag["code"]), tags[0])
+        return {"status": "ok", **primary, "tags": tags}
+
+    rois = [det["roi"] for det in detections]
+    if use_preprocess:
+        rois = [_preprocess(roi, fused) for roi in rois]
+
+    recognized = _components["ocr_engine"].recognize_number_codes(rois)
+    return _tags_result(detections, recognized)
+
+
+def _tags_result(
+    detections: List[Dict[str, Any]],
+    recognized: List[Tuple[Optional[str], float]]
+) -> Dict[str, Any]:
+    """由检测结果与对应的识别结果组成多标签结果"""
+    tags = [
+        {"code": code, "confidence": confidence, "bbox": det["bbox"]}
+        for det, (code, confidence) in zip(detections, recognized)
+    ]
+
+    # 主结果取第一个识别成功的标签（检测结果按面积从大到小排列）
+    primary = next((tag for tag in tags if tag["code"]), tags[0])
+    return {"status": "ok", **primary, "tags": tags}
+
+
+def recognize_batch_bytes(
+    contents_list: List[bytes],
+    use_preprocess: bool = True,
+    multi: bool = False,
+    fused: bool = False
+) -> List[Dict[str, Any]]:
+    """
+    批量识别：并行解码所有图像，收集全部ROI后一次送入OCR引擎
+
+    选项与 recognize_bytes 相同，返回值与之一致，按输入顺序排列（级联模式下逐个识别）
+    """
+    global _decode_pool
+    if _decode_pool is None:
+        _decode_pool = ThreadPoolExecutor(max_workers=min(8, os.cpu_count() or 1), thread_name_prefix="decode")
+
+    decoded = list(_decode_pool.map(partial(decode_for_detection, gray=fused), contents_list))
+
+    results: List[Optional[Dict[str, Any]]] = []
+    rois = []
+    # (结果下标, 参与识别的检测结果, 其ROI在 rois 中的起始位置)
+    roi_owners = []
+
+    for contents, (img, factor) in zip(contents_list, decoded):
+        if img is None:
+            results.append({"status": "decode_error", "code": None, "confidence": 0.0, "bbox": None})
+            continue
+
+        detections = _detect_and_crop(contents, img, factor)
+        if not detections or _components["cascade"] is not None:
+            results.append(_recognize_detections(detections, use_preprocess, multi, fused))
+            continue
+
+        selected = detections if multi else detections[:1]
+        roi_owners.append((len(results), selected, len(rois)))
+        for det in selected:
+            rois.append(_preprocess(det["roi"], fused) if use_preprocess else det["roi"])
+        results.append(None)
+
+    # 所有ROI合并为一次批量识别
+    recognized = _components["ocr_engine"].recognize_number_codes(rois)
+    for index, selected, start in roi_owners:
+        own = recognized[start:start + len(selected)]
+        if multi:
+            results[index] = _tags_result(selected, own)
+        else:
+            code, confidence = own[0]
+            results[index] = {"status": "ok", "code": code, "confidence": confidence, "bbox": selected[0]["bbox"]}
+
+    return results
+
+
+def detect_bytes(contents: bytes) -> Optional[list]:
+    """仅检测，图像无法解码时返回 None（检测框为原图坐标）"""
+    img, factor = decode_for_detection(contents)
+    if img is None:
+        return None
+
+    detections = _components["detector"].detect(img, source_scale=1 / factor)
+    if factor == 1:
+        return detections
+
+    width, height = _components["preprocessor"].read_jpeg_size(contents)
+    return [
+        {**det, "bbox": [
+            int(det["bbox"][0]) * factor,
+            int(det["bbox"][1]) * factor,
+            min(width, int(det["bbox"][2]) * factor),
+            min(height, int(det["bbox"][3]) * factor),
+        ]}
+        for det in detections
+    ]
+
+
+def _init_worker(threads: Optional[int], status_queue: Any, barrier: Any, *args):
+    """
+    工作进程初始化：先设置线程预算，再加载组件（torch 在此之后才导入，环境变量对其生效）
+
+    status_queue 不为空时把加载后的组件状态报告给主进程，/ready 读取这些状态而不经过识别队列
+    """
+    if threads:
+        apply_thread_budget(threads)
+    init_components(*args)
+    _worker_sync["status_queue"] = status_queue
+    _worker_sync["barrier"] = barrier
+    if status_queue is not None:
+        status_queue.put(component_status())
+
+
+def _warm_up_worker() -> Dict[str, Any]:
+    """
+    进程池预热任务：预热本进程后在屏障处等待
+
+    已预热的进程阻塞在屏障上，不会再领取其余预热任务，因此每个工作进程恰好预热一次
+    """
+    status = warm_up()
+    _worker_sync["status_queue"].put(status)
+    _worker_sync["barrier"].wait(timeout=WARMUP_BARRIER_TIMEOUT)
+    return status
+
+
+def _run_collecting_metrics(fn: Callable, *args) -> Tuple[Any, list]:
+    """在工作进程中执行并回传本次记录的指标"""
+    result = fn(*args)
+    return result, metrics.REGISTRY.drain()
+
+
+class PipelineExecutor:
+    """
+    识别流水线执行器
+
+    workers > 0 时使用进程池，每个工作进程独立加载模型；
+    workers = 0 时在当前进程加载模型，并在单个后台线程中串行执行；
+    preloaded=True 时组件已由 pre-fork 主进程加载并随 fork 继承，只设置线程预算。
+    threads 为每个实例的线程预算（torch / OpenCV / OMP），实例数 × 线程数不超过核数时不会超额订阅；
+    进程池的工作进程从共享队列取任务，请求总是交给空闲的实例。
+    """
+
+    def __init__(
+        self,
+        workers: int = 0,
+        confidence: float = 0.5,
+        use_gpu: bool = False,
+        lazy: bool = False,
+        detector_options: Optional[Dict[str, Any]] = None,
+        reduced_decode_side: Optional[int] = None,
+        ocr_options: Optional[Dict[str, Any]] = None,
+        cascade: Any = None,
+        threads: Optional[int] = None,
+        preloaded: bool = False
+    ):
+        self.workers = workers
+        self.threads = threads
+        self.in_flight = 0
+        self.pool: Executor
+        self.status_queue: Any = None
+        # 各工作进程最近报告的组件状态（pid → 状态）
+        self.worker_status: Dict[int, Dict[str, Any]] = {}
+        init_args = (confidence, use_gpu, lazy, detector_options, reduced_decode_side, ocr_options, cascade)
+
+        if workers > 0:
+            # 主进程不运行模型：环境变量由 spawn 的工作进程继承，在其加载 NumPy/BLAS 之前即生效
+            if threads:
+                for var in THREAD_ENV_VARS:
+                    os.environ[var] = str(threads)
+
+            # spawn 避免在已加载 torch 的进程上 fork
+            context = multiprocessing.get_context("spawn")
+            self.status_queue = context.Queue()
+            self.pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=context,
+                initializer=_init_worker,
+                initargs=(threads, self.status_queue, context.Barrier(workers), *init_args),
+            )
+            logger.info(f"✅ 识别进程池已启动 (工作进程: {workers}, 每进程线程: {threads or '默认'})")
+        elif preloaded:
+            if threads:
+                apply_thread_budget(threads)
+            self.pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ocr")
+        else:
+            _init_worker(threads, None, None, *init_args)
+            self.pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ocr")
+
+    async def run(self, fn: Callable, *args) -> Any:
+        """在执行器中运行流水线函数并等待结果"""
+        loop = asyncio.get_running_loop()
+        self.in_flight += 1
+        try:
+            if self.workers == 0:
+                return await loop.run_in_executor(self.pool, fn, *args)
+
+            # 工作进程的指标随结果回传，汇总到主进程
+            result, deltas = await loop.run_in_executor(self.pool, _run_collecting_metrics, fn, *args)
+            metrics.REGISTRY.merge(deltas)
+            return result
+        finally:
+            self.in_flight -= 1
+
+    async def warm_up(self) -> List[Dict[str, Any]]:
+        """预热每个实例：进程池模式下每个工作进程各执行一次 warm_up，返回各进程的结果"""
+        if self.workers == 0:
+            return [await self.run(warm_up)]
+        return list(await asyncio.gather(*(self.run(_warm_up_worker) for _ in range(self.workers))))
+
+    def component_status(self) -> List[Dict[str, Any]]:
+        """
+        各实例的组件状态，不经过识别队列
+
+        线程模式直接读取本进程；进程池模式为工作进程启动与预热时报告的状态（尚未启动的进程不在其中）
+        """
+        if self.workers == 0:
+            return [component_status()]
+        while True:
+            try:
+                status = self.status_queue.get_nowait()
+            except queue.Empty:
+                break
+            self.worker_status[status["pid"]] = status
+        return list(self.worker_status.values())
+
+    def stats(self) -> Dict[str, Any]:
+        """实例数、每实例线程预算与当前在途请求数（超过实例数的部分在排队）"""
+        instances = max(1, self.workers)
+        return {
+            "workers": self.workers,
+            "threads_per_worker": self.threads,
+            "in_flight": self.in_flight,
+            "queued": max(0, self.in_flight - instances),
+        }
+
+    def shutdown(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,255 @@
+"""
+预派生（pre-fork）多进程服务
+
+主进程加载检测器与 OCR 引擎后再 fork 出 N 个服务进程，共用同一个监听 socket。
+模型权重所在的内存页在 fork 后由各进程写时复制共享，只读使用时不会被复制，
+每个服务进程只额外占用自身的私有内存，单机可运行的进程数远多于各自加载模型的方式。
+
+主进程只负责监督：
+    - 服务进程退出时补充新的进程
+    - 处理的请求数超过 max_requests，或私有内存超过 max_rss_mb 时，
+      发送 SIGTERM 让其处理完在途请求后退出，再补充新的进程（一次只回收一个，避免容量骤降）
+
+注意：fork 前主进程不做推理且只用单线程加载模型（OpenMP 线程池在 fork 后不可用），
+服务进程启动后各自设置线程预算。
+"""
+import gc
+import os
+import signal
+import socket
+import time
+from dataclasses import dataclass
+from multiprocessing.sharedctypes import RawArray
+from typing import Any, Callable, Dict, Optional
+
+import uvicorn
+from loguru import logger
+
+from engine_pool import apply_thread_budget
+
+# 主进程检查服务进程状态的间隔（秒）
+CHECK_INTERVAL = 1.0
+
+# 启动后在此时间内退出的服务进程视为启动失败，补充前先等待；此时间内也不按阈值回收，避免反复 fork
+MIN_UPTIME = 5.0
+
+
+def private_memory_mb(pid: int) -> float:
+    """
+    进程的私有内存（MB）：RSS 中不与其他进程共享的部分
+
+    写时复制共享的模型页计入每个进程的 RSS，按 RSS 判断会把共享的模型重复计算，
+    因此使用 smaps_rollup 中的 Private_Clean + Private_Dirty；不可用时退回 RSS
+    """
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            private_kb = sum(
+                int(line.split()[1]) for line in f if line.startswith(("Private_Clean:", "Private_Dirty:"))
+            )
+        return private_kb / 1024
+    except OSError:
+        pass
+
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except OSError:
+        return 0.0
+
+
+@dataclass
+class WorkerState:
+    """服务进程状态"""
+    pid: int
+    started_at: float
+    stopping_since: Optional[float] = None
+    reason: str = ""
+
+
+class PreforkServer:
+    """加载模型后 fork 服务进程并监督回收的主进程"""
+
+    def __init__(
+        self,
+        app: Any,
+        preload: Callable[[], None],
+        host: str = "0.0.0.0",
+        port: int = 8000,
+        workers: int = 2,
+        threads: Optional[int] = None,
+        max_requests: int = 0,
+        max_rss_mb: float = 0.0,
+        graceful_timeout: float = 30.0
+    ):
+        """
+        Args:
+            app: ASGI 应用
+            preload: 在主进程中加载模型的函数（fork 前调用）
+            workers: 服务进程数
+            threads: 每个服务进程的线程预算
+            max_requests: 服务进程处理的请求数（HTTP 请求与 WebSocket 连接）达到此值后回收，0 表示不限
+            max_rss_mb: 服务进程私有内存超过此值（MB）后回收，0 表示不限
+            graceful_timeout: 回收或停止时等待服务进程退出的时间，超时后强制结束
+        """
+        if not hasattr(os, "fork"):
+            raise RuntimeError("pre-fork 模式需要支持 fork 的平台")
+
+        self.app = app
+        self.preload = preload
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.threads = threads
+        self.max_requests = max_requests
+        self.max_rss_mb = max_rss_mb
+        self.graceful_timeout = graceful_timeout
+
+        self.slots: Dict[int, WorkerState] = {}
+        # 每个槽位的请求计数，放在 fork 前创建的共享内存中，服务进程累加、主进程读取
+        self.requests = RawArray("Q", workers)
+        self.stopping = False
+        self.sock: Optional[socket.socket] = None
+
+    def run(self):
+        """加载模型、fork 服务进程并监督，直到收到 SIGTERM / SIGINT"""
+        # 主进程不做推理，单线程加载；服务进程 fork 后再设置各自的线程预算
+        apply_thread_budget(1)
+        start = time.time()
+        self.preload()
+        logger.info(f"✅ 主进程模型加载完成 ({time.time() - start:.2f}s)，fork {self.workers} 个服务进程")
+
+        # 已加载的对象移入永久代：垃圾回收不再扫描、改写其对象头，共享页不会因此被复制
+        gc.collect()
+        gc.freeze()
+
+        self.sock = socket.create_server((self.host, self.port), backlog=2048)
+
+        signal.signal(signal.SIGTERM, self._handle_stop)
+        signal.signal(signal.SIGINT, self._handle_stop)
+
+        for slot in range(self.workers):
+            self._spawn(slot)
+
+        try:
+            while not self.stopping:
+                self._reap()
+                self._recycle()
+                time.sleep(CHECK_INTERVAL)
+        finally:
+            self._shutdown()
+
+    def _handle_stop(self, signum, frame):
+        self.stopping = True
+
+    def _spawn(self, slot: int):
+        self.requests[slot] = 0
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                self._serve(slot)
+            except BaseException:
+                logger.exception(f"服务进程异常退出 (槽位: {slot})")
+                code = 1
+            finally:
+                os._exit(code)
+
+        self.slots[slot] = WorkerState(pid=pid, started_at=time.time())
+        logger.info(f"服务进程已启动 (槽位: {slot}, pid: {pid})")
+
+    def _serve(self, slot: int):
+        """服务进程：恢复默认信号处理，设置线程预算后在继承的 socket 上运行 uvicorn"""
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        if self.threads:
+            apply_thread_budget(self.threads)
+
+        requests = self.requests
+        app = self.app
+
+        async def counted_app(scope, receive, send):
+            if scope["type"] in ("http", "websocket"):
+                requests[slot] += 1
+            await app(scope, receive, send)
+
+        config = uvicorn.Config(counted_app, timeout_graceful_shutdown=self.graceful_timeout)
+        uvicorn.Server(config).run(sockets=[self.sock])
+
+    def _reap(self):
+        """回收已退出的服务进程并补充"""
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+
+            slot = next((s for s, w in self.slots.items() if w.pid == pid), None)
+            if slot is None:
+                continue
+            worker = self.slots.pop(slot)
+            uptime = time.time() - worker.started_at
+            if worker.stopping_since is not None:
+                logger.info(f"服务进程已回收 (槽位: {slot}, pid: {pid}, 原因: {worker.reason})")
+            else:
+                logger.warning(f"服务进程意外退出 (槽位: {slot}, pid: {pid}, 状态: {status}, 运行: {uptime:.1f}s)")
+                if uptime < MIN_UPTIME:
+                    time.sleep(MIN_UPTIME - uptime)
+
+            if not self.stopping:
+                self._spawn(slot)
+
+    def _recycle(self):
+        """超时未退出的进程强制结束；没有进程在回收时，回收一个超出阈值的进程"""
+        now = time.time()
+        for worker in self.slots.values():
+            if worker.stopping_since is not None and now - worker.stopping_since > self.graceful_timeout:
+                logger.warning(f"服务进程未在 {self.graceful_timeout}s 内退出，强制结束 (pid: {worker.pid})")
+                self._signal(worker.pid, signal.SIGKILL)
+
+        if any(w.stopping_since is not None for w in self.slots.values()):
+            return
+
+        for slot, worker in self.slots.items():
+            # 刚启动的进程不回收，阈值设置过低时也不会反复 fork
+            if now - worker.started_at < MIN_UPTIME:
+                continue
+            reason = ""
+            if self.max_requests and self.requests[slot] >= self.max_requests:
+                reason = f"请求数 {self.requests[slot]}"
+            elif self.max_rss_mb:
+                memory = private_memory_mb(worker.pid)
+                if memory > self.max_rss_mb:
+                    reason = f"私有内存 {memory:.0f}MB"
+
+            if reason:
+                worker.stopping_since, worker.reason = now, reason
+                self._signal(worker.pid, signal.SIGTERM)
+                return
+
+    def _shutdown(self):
+        """停止全部服务进程"""
+        logger.info("正在停止服务进程")
+        now = time.time()
+        for worker in self.slots.values():
+            worker.stopping_since, worker.reason = now, "服务停止"
+            self._signal(worker.pid, signal.SIGTERM)
+
+        deadline = time.time() + self.graceful_timeout
+        while self.slots and time.time() < deadline:
+            self._reap()
+            time.sleep(0.1)
+        for worker in self.slots.values():
+            self._signal(worker.pid, signal.SIGKILL)
+
+        if self.sock is not None:
+            self.sock.close()
+
+    @staticmethod
+    def _signal(pid: int, signum: int):
+        try:
+            os.kill(pid, signum)
+        except ProcessLookupError:
+            pass
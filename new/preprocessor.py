@@ -1,10 +1,39 @@
 """
 图像预处理模块 - 提升识别准确率
 """
+import struct
+import threading
+from typing import Optional, Tuple
+
 import cv2
 import numpy as np
 from loguru import logger
 
+from metrics import stage_timer
+
+# JPEG 帧起始标记 SOF0~SOF15（0xC4 DHT、0xC8 JPG、0xCC DAC 不是）
+JPEG_SOF_MARKERS = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+# 缩小倍数 -> DCT 域缩小解码标志（彩色, 灰度）
+REDUCED_DECODE_FLAGS = (
+    (8, cv2.IMREAD_REDUCED_COLOR_8, cv2.IMREAD_REDUCED_GRAYSCALE_8),
+    (4, cv2.IMREAD_REDUCED_COLOR_4, cv2.IMREAD_REDUCED_GRAYSCALE_4),
+    (2, cv2.IMREAD_REDUCED_COLOR_2, cv2.IMREAD_REDUCED_GRAYSCALE_2),
+)
+
+# 各线程复用的预处理中间缓冲区
+_buffers = threading.local()
+
+
+def _buffer(name: str, shape: Tuple[int, int]) -> np.ndarray:
+    """取当前线程的复用缓冲区，容量不足时扩容；返回连续的二维视图"""
+    size = shape[0] * shape[1]
+    buf = getattr(_buffers, name, None)
+    if buf is None or buf.size < size:
+        buf = np.empty(max(size, 1), np.uint8)
+        setattr(_buffers, name, buf)
+    return buf[:size].reshape(shape)
+
 
 class ImagePreprocessor:
     """图像预处理器"""
@@ -20,6 +49,65 @@ class ImagePreprocessor:
             logger.error(f"图像解码失败: {e}")
             return None
     
+    @staticmethod
+    def read_jpeg_size(data: bytes) -> Optional[Tuple[int, int]]:
+        """
+        只解析JPEG头部读取图像尺寸，不解码像素
+
+        Returns:
+            (宽, 高)，不是JPEG或头部损坏时返回 None
+        """
+        if len(data) < 4 or data[0] != 0xFF or data[1] != 0xD8:
+            return None
+
+        pos = 2
+        while pos + 4 <= len(data):
+            if data[pos] != 0xFF:
+                return None
+            marker = data[pos + 1]
+            # 填充字节与无长度的独立标记
+            if marker == 0xFF:
+                pos += 1
+                continue
+            if marker == 0x01 or 0xD0 <= marker <= 0xD7:
+                pos += 2
+                continue
+
+            (length,) = struct.unpack(">H", data[pos + 2:pos + 4])
+            if marker in JPEG_SOF_MARKERS:
+                if pos + 9 > len(data):
+                    return None
+                height, width = struct.unpack(">HH", data[pos + 5:pos + 9])
+                return (width, height) if width and height else None
+            pos += 2 + length
+
+        return None
+
+    @staticmethod
+    def decode_reduced(data: bytes, min_side: int, gray: bool = False) -> Tuple[Optional[np.ndarray], int]:
+        """
+        按需缩小解码：根据JPEG头部尺寸选择最大的缩小倍数，使解码后最长边不小于 min_side
+
+        IMREAD_REDUCED_COLOR_2/4/8 在 DCT 域直接缩小，解码耗时与峰值内存随倍数下降。
+        非JPEG或无需缩小时按原尺寸解码。gray=True 时直接解码为单通道灰度图。
+
+        Returns:
+            (图像, 缩小倍数)，无法解码时图像为 None
+        """
+        nparr = np.frombuffer(data, np.uint8)
+        size = ImagePreprocessor.read_jpeg_size(data)
+
+        if size is not None:
+            longest = max(size)
+            for factor, color_flag, gray_flag in REDUCED_DECODE_FLAGS:
+                if longest // factor >= min_side:
+                    image = cv2.imdecode(nparr, gray_flag if gray else color_flag)
+                    if image is not None:
+                        return image, factor
+                    break
+
+        return cv2.imdecode(nparr, cv2.IMREAD_GRAYSCALE if gray else cv2.IMREAD_COLOR), 1
+
     @staticmethod
     def enhance_image(image: np.ndarray) -> np.ndarray:
         """图像增强处理"""
@@ -57,6 +145,8 @@ class ImagePreprocessor:
         if image is None:
             return None
         try:
+            if image.ndim == 2:
+                return cv2.fastNlMeansDenoising(image, None, 6, 7, 21)
             return cv2.fastNlMeansDenoisingColored(image, None, 6, 6, 7, 21)
         except Exception as e:
             logger.warning(f"降噪处理失败: {e}")
@@ -91,24 +181,60 @@ class ImagePreprocessor:
             return None
         
         try:
-            # 放大图像便于OCR识别
-            scale = 2.0
-            roi = cv2.resize(roi, None, fx=scale, fy=scale, interpolation=cv2.INTER_CUBIC)
-            
-            # 转灰度
-            gray = cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY)
-            
-            # 二值化
-            _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-            
-            # 转回BGR供PaddleOCR使用
-            result = cv2.cvtColor(binary, cv2.COLOR_GRAY2BGR)
+            with stage_timer("preprocess"):
+                # 放大图像便于OCR识别
+                scale = 2.0
+                roi = cv2.resize(roi, None, fx=scale, fy=scale, interpolation=cv2.INTER_CUBIC)
+                
+                # 转灰度
+                gray = cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY)
+                
+                # 二值化
+                _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+                
+                # 转回BGR供PaddleOCR使用
+                result = cv2.cvtColor(binary, cv2.COLOR_GRAY2BGR)
             
             return result
         except Exception as e:
             logger.warning(f"OCR预处理失败: {e}")
             return roi
     
+    @staticmethod
+    def preprocess_for_ocr_gray(roi: np.ndarray) -> np.ndarray:
+        """
+        OCR专用预处理（单通道融合版）
+
+        灰度 → 放大 → Otsu二值化，全程单通道：先转灰度再放大，
+        中间结果写入线程内复用的缓冲区，只有输出的二值图是新分配的。
+        输出为单通道二值图，OCR引擎据此跳过对比度增强。
+        """
+        if roi is None:
+            return None
+        
+        try:
+            with stage_timer("preprocess"):
+                h, w = roi.shape[:2]
+                
+                # 转灰度（输入已是灰度时直接使用）
+                if roi.ndim == 3:
+                    gray = _buffer("gray", (h, w))
+                    cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY, dst=gray)
+                else:
+                    gray = roi
+                
+                # 放大图像便于OCR识别
+                scaled = _buffer("scaled", (h * 2, w * 2))
+                cv2.resize(gray, (w * 2, h * 2), dst=scaled, interpolation=cv2.INTER_CUBIC)
+                
+                # 二值化
+                _, binary = cv2.threshold(scaled, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+            
+            return binary
+        except Exception as e:
+            logger.warning(f"OCR预处理失败: {e}")
+            return roi
+    
     @staticmethod
     def encode_frame(image: np.ndarray, quality: int = 85) -> bytes:
         """编码图像为JPEG"""
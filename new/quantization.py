@@ -0,0 +1,112 @@
+"""
+EasyOCR 识别网络的 int8 动态量化
+
+识别网络（CNN 特征提取 + BiLSTM + 线性层）中的 LSTM 与线性层权重量化为 int8，
+激活在推理时动态量化，CPU 上推理更快、内存占用更小；卷积层保持 float32。
+
+量化后的识别网络（连同字符转换器）缓存到 models/ 下，之后启动时直接加载缓存，
+不再读取 float32 权重、也不再重复量化；缓存按 EasyOCR / torch 版本与量化后端区分，
+版本变化或加载失败时重新量化并覆盖缓存。
+
+EasyOCR 在 CPU 上默认也会尝试量化（quantize=True），但失败时静默回退到 float32，
+且每次启动都重新量化；这里显式选择量化后端、记录实际生效的精度。
+精度变化可用 ocr_accuracy.py 在标注样本上与 float32 对比确认。
+"""
+import io
+import importlib.metadata
+import platform
+from pathlib import Path
+from typing import Any, List
+
+from loguru import logger
+
+MODELS_DIR = Path(__file__).parent.parent / "models"
+
+PRECISIONS = ("fp32", "int8")
+
+
+def select_engine() -> str:
+    """选择量化计算后端：x86 使用 fbgemm，ARM 使用 qnnpack"""
+    import torch
+
+    supported = torch.backends.quantized.supported_engines
+    preferred = "qnnpack" if platform.machine().lower() in ("arm64", "aarch64") else "fbgemm"
+    engine = preferred if preferred in supported else next((e for e in supported if e != "none"), "none")
+    if engine != "none":
+        torch.backends.quantized.engine = engine
+    return engine
+
+
+def quantize_module(model: Any) -> Any:
+    """将 LSTM 与线性层动态量化为 int8"""
+    import torch
+    from torch import nn
+
+    return torch.quantization.quantize_dynamic(model, {nn.LSTM, nn.Linear}, dtype=torch.qint8)
+
+
+def model_size(model: Any) -> int:
+    """模型序列化后的字节数（动态量化的打包权重不在 parameters() 中，按 state_dict 计算）"""
+    import torch
+
+    buffer = io.BytesIO()
+    torch.save(model.state_dict(), buffer)
+    return buffer.getbuffer().nbytes
+
+
+def cache_path(lang_list: List[str], engine: str) -> Path:
+    """量化缓存文件路径，文件名包含语言、EasyOCR 与 torch 版本及量化后端"""
+    import torch
+
+    easyocr_version = importlib.metadata.version("easyocr")
+    torch_version = torch.__version__.replace("+", "_")
+    return MODELS_DIR / f"easyocr_{'_'.join(lang_list)}_{easyocr_version}_torch{torch_version}_{engine}.int8.pt"
+
+
+def load_quantized_reader(lang_list: List[str], detector: bool = True) -> Any:
+    """
+    创建识别网络为 int8 的 EasyOCR Reader（仅 CPU）
+
+    Args:
+        lang_list: 识别语言
+        detector: 是否加载 CRAFT 文本检测模型（只识别模式不需要）
+
+    Returns:
+        easyocr.Reader；量化后端不可用时为 EasyOCR 未量化的 float32 Reader
+    """
+    import torch
+    import easyocr
+
+    engine = select_engine()
+    if engine == "none":
+        logger.warning("当前 torch 不支持量化后端，识别网络保持 float32")
+        return easyocr.Reader(lang_list, gpu=False, detector=detector, quantize=False, verbose=False)
+
+    path = cache_path(lang_list, engine)
+    if path.exists():
+        try:
+            # 缓存是整个量化后的模块，跳过 float32 识别网络的加载
+            reader = easyocr.Reader(lang_list, gpu=False, detector=detector, recognizer=False, verbose=False)
+            payload = torch.load(path, map_location="cpu", weights_only=False)
+            reader.recognizer = payload["recognizer"]
+            reader.converter = payload["converter"]
+            logger.info(f"✅ 已加载 int8 识别网络缓存: {path}")
+            return reader
+        except Exception as e:
+            logger.warning(f"int8 识别网络缓存加载失败，重新量化: {e}")
+
+    reader = easyocr.Reader(lang_list, gpu=False, detector=detector, quantize=False, verbose=False)
+    float_size = model_size(reader.recognizer)
+    reader.recognizer = quantize_module(reader.recognizer)
+
+    try:
+        MODELS_DIR.mkdir(parents=True, exist_ok=True)
+        torch.save({"recognizer": reader.recognizer, "converter": reader.converter}, path)
+    except Exception as e:
+        logger.warning(f"int8 识别网络缓存写入失败: {e}")
+
+    logger.info(
+        f"✅ 识别网络已量化为int8 ({engine}): "
+        f"{float_size / 1e6:.1f}MB -> {model_size(reader.recognizer) / 1e6:.1f}MB"
+    )
+    return reader
@@ -0,0 +1,338 @@
+"""
+常驻识别进程 - 预加载检测器与OCR引擎，按长度前缀帧收发请求
+
+协议（stdin/stdout 或 Unix socket）:
+    每一帧 = 4字节大端无符号长度 + 数据
+    请求 = JSON头帧 + 数据帧（op 为 detect/ocr/recognize 时为图像，其余为空帧）
+    响应 = JSON帧，回传请求中的 id
+    就绪 = 开始服务（模型已加载）时先发送一帧 {"type": "ready", "pid", "load_time"}，客户端据此开始健康检查
+
+    每个请求固定两帧，识别进程先读完两帧再解析请求头，请求头无法解析或帧过大时流仍保持对齐
+
+共享内存模式（--shm）:
+    请求头携带 shm_slot 时数据帧为空，图像从 /dev/shm 环形缓冲区的对应槽位读取，
+    结果 JSON 写回同一槽位，响应帧只包含 {"id", "shm_slot", "result_len"}
+
+用法:
+    python recognizer_daemon.py                       # 通过 stdin/stdout 通信
+    python recognizer_daemon.py --socket /tmp/ocr.sock
+    python recognizer_daemon.py --shm /dev/shm/recognizer.ring
+"""
+import argparse
+import json
+import os
+import socket
+import struct
+import sys
+import time
+from typing import Any, BinaryIO, Dict, Optional
+
+import numpy as np
+import cv2
+from loguru import logger
+
+from shm_ring import ShmRing
+from engine_pool import apply_thread_budget
+
+HEADER = struct.Struct(">I")
+MAX_FRAME_SIZE = 64 * 1024 * 1024
+
+IMAGE_OPS = ("detect", "ocr", "recognize")
+
+
+def read_frame(stream: BinaryIO) -> Optional[bytes]:
+    """读取一帧，流结束时返回 None；帧过大时读掉其数据后抛出 ValueError，下一帧仍然对齐"""
+    header = stream.read(HEADER.size)
+    if not header or len(header) < HEADER.size:
+        return None
+    (length,) = HEADER.unpack(header)
+    if length > MAX_FRAME_SIZE:
+        remaining = length
+        while remaining:
+            chunk = stream.read(min(remaining, 1 << 20))
+            if not chunk:
+                return None
+            remaining -= len(chunk)
+        raise ValueError(f"帧过大: {length} bytes")
+    data = stream.read(length)
+    if len(data) < length:
+        return None
+    return data
+
+
+def write_frame(stream: BinaryIO, data: bytes):
+    """写入一帧并立即刷新"""
+    stream.write(HEADER.pack(len(data)))
+    stream.write(data)
+    stream.flush()
+
+
+def _json_default(obj):
+    if isinstance(obj, np.integer):
+        return int(obj)
+    if isinstance(obj, np.floating):
+        return float(obj)
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    raise TypeError(f"无法序列化类型: {type(obj).__name__}")
+
+
+class RecognizerDaemon:
+    """常驻识别进程，模型只在启动时加载一次"""
+
+    def __init__(
+        self,
+        confidence: float = 0.5,
+        use_gpu: bool = False,
+        detector_options: Optional[Dict[str, Any]] = None,
+        ocr_options: Optional[Dict[str, Any]] = None,
+        shm_path: Optional[str] = None
+    ):
+        from detector import NumberDetector
+        from preprocessor import ImagePreprocessor
+        from ocr_engine import OCREngine
+
+        start = time.time()
+        self.detector = NumberDetector(confidence=confidence, **(detector_options or {}))
+        self.preprocessor = ImagePreprocessor()
+        self.ocr_options = ocr_options or {}
+        self.ocr_engine = OCREngine(use_gpu=use_gpu, **self.ocr_options)
+        # 按 use_gpu 区分的 OCR 引擎；请求指定的模式与启动参数不同时首次使用再加载
+        self.ocr_engines = {use_gpu: self.ocr_engine}
+        self.started_at = time.time()
+        self.load_time = self.started_at - start
+        self.request_count = 0
+        self.ring = ShmRing(shm_path) if shm_path else None
+        if self.ring:
+            logger.info(f"共享内存缓冲区: {self.ring.get_info()}")
+
+        logger.info(f"✅ 常驻识别进程就绪 (pid: {os.getpid()}, 加载耗时: {self.load_time:.2f}s)")
+
+    def handle(
+        self,
+        header: Dict[str, Any],
+        payload: Optional[bytes],
+        img: Optional[np.ndarray] = None
+    ) -> Dict[str, Any]:
+        """处理单个请求；img 为已从共享内存取得的图像，此时忽略 payload"""
+        op = header.get("op")
+
+        if op == "ping":
+            return {
+                "ok": True,
+                "pid": os.getpid(),
+                "uptime": time.time() - self.started_at,
+                "load_time": self.load_time,
+                "requests": self.request_count,
+                "components": {
+                    "yolo": self.detector.use_yolo and self.detector.model is not None,
+                    "easyocr": self.ocr_engine.use_easyocr and self.ocr_engine.reader is not None,
+                    "digits": self.ocr_engine.backend == "digits",
+                },
+            }
+
+        if op not in IMAGE_OPS:
+            return {"error": f"未知操作: {op}"}
+
+        self.request_count += 1
+
+        if img is None:
+            img = cv2.imdecode(np.frombuffer(payload or b"", np.uint8), cv2.IMREAD_COLOR)
+        if img is None:
+            return {"error": "无法读取图像"}
+
+        if op == "detect":
+            return self._detect(img, header)
+        if op == "ocr":
+            number_code, confidence = self._get_ocr_engine(header).recognize_number_code(img)
+            return {"number_code": number_code, "confidence": confidence}
+        return self._recognize(img, header)
+
+    def _get_ocr_engine(self, header: Dict[str, Any]):
+        """请求头 use_gpu 对应的 OCR 引擎，未指定时使用启动时加载的引擎"""
+        use_gpu = header.get("use_gpu")
+        if use_gpu is None:
+            return self.ocr_engine
+
+        use_gpu = bool(use_gpu)
+        if use_gpu not in self.ocr_engines:
+            from ocr_engine import OCREngine
+
+            logger.info(f"加载 {'GPU' if use_gpu else 'CPU'} 模式的OCR引擎")
+            self.ocr_engines[use_gpu] = OCREngine(use_gpu=use_gpu, **self.ocr_options)
+        return self.ocr_engines[use_gpu]
+
+    def _detect(self, img: np.ndarray, header: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        与 /api/yolo/detect 的检测脚本顺序一致：YOLO 优先，无结果时轮廓检测
+
+        置信度阈值只作用于本次请求；detection_method 为实际产出检测框的阶段，
+        YOLO 与轮廓检测均无结果时为 yolo_no_result（YOLO 不可用时为 contour）
+        """
+        confidence = float(header.get("confidence", self.detector.confidence))
+        yolo_ready = self.detector.load_model()
+
+        detections = self.detector.detect_stage(img, "yolo", confidence=confidence) if yolo_ready else []
+        if detections:
+            detection_method = "yolo"
+        else:
+            detections = self.detector.detect_stage(img, "contour")
+            detection_method = "contour" if detections or not yolo_ready else "yolo_no_result"
+
+        return {
+            "detections": detections,
+            "image_width": img.shape[1],
+            "image_height": img.shape[0],
+            "detection_method": detection_method,
+        }
+
+    def _recognize(self, img: np.ndarray, header: Dict[str, Any]) -> Dict[str, Any]:
+        detections = self.detector.detect_and_crop(img)
+        if not detections:
+            return {"code": None, "confidence": 0.0, "bbox": None, "message": "未检测到数字标签"}
+
+        det = detections[0]
+        roi = det["roi"]
+        if header.get("use_preprocess", True):
+            # 共享内存中的原始灰度帧走单通道预处理
+            if roi.ndim == 2:
+                roi = self.preprocessor.preprocess_for_ocr_gray(roi)
+            else:
+                roi = self.preprocessor.preprocess_for_ocr(roi)
+
+        code, confidence = self._get_ocr_engine(header).recognize_number_code(roi)
+        return {
+            "code": code,
+            "confidence": confidence,
+            "bbox": det["bbox"],
+            "message": "识别成功" if code else "未能识别数字",
+        }
+
+    def serve(self, reader: BinaryIO, writer: BinaryIO):
+        """先发送就绪帧，再循环处理请求，直到对端关闭"""
+        ready = {"type": "ready", "pid": os.getpid(), "load_time": self.load_time}
+        write_frame(writer, json.dumps(ready).encode("utf-8"))
+
+        while True:
+            # 先读完请求头与数据帧再解析，任何一步失败都不会把数据帧当作下一个请求头
+            frames, frame_error = [], None
+            for _ in range(2):
+                try:
+                    frame = read_frame(reader)
+                except ValueError as e:
+                    frame, frame_error = b"", e
+                if frame is None:
+                    return
+                frames.append(frame)
+            frame, payload = frames
+
+            request_id = None
+            try:
+                if frame_error is not None:
+                    raise frame_error
+                header = json.loads(frame.decode("utf-8"))
+                if not isinstance(header, dict):
+                    raise ValueError("请求头必须是 JSON 对象")
+                request_id = header.get("id")
+                slot = header.get("shm_slot")
+                if slot is not None and header.get("op") in IMAGE_OPS:
+                    response = self._handle_shm(header, slot)
+                else:
+                    response = self.handle(header, payload)
+            except Exception as e:
+                logger.error(f"请求处理失败: {e}")
+                response = {"error": str(e)}
+
+            response["id"] = request_id
+            write_frame(writer, json.dumps(response, default=_json_default).encode("utf-8"))
+
+    def _handle_shm(self, header: Dict[str, Any], slot: int) -> Dict[str, Any]:
+        """处理共享内存槽位中的请求，结果写回槽位"""
+        if self.ring is None:
+            return {"error": "未启用共享内存缓冲区"}
+
+        img, _ = self.ring.read_image(slot)
+        if img is None:
+            return {"error": "无法读取图像"}
+
+        response = self.handle(header, None, img)
+        if "error" in response:
+            return response
+
+        result = json.dumps(response, default=_json_default).encode("utf-8")
+        self.ring.write_result(slot, result)
+        return {"shm_slot": slot, "result_len": len(result)}
+
+
+def serve_unix_socket(daemon: RecognizerDaemon, socket_path: str):
+    """在 Unix socket 上依次服务每个连接"""
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(socket_path)
+    server.listen(8)
+    logger.info(f"监听 Unix socket: {socket_path}")
+
+    try:
+        while True:
+            conn, _ = server.accept()
+            with conn, conn.makefile("rb") as reader, conn.makefile("wb") as writer:
+                try:
+                    daemon.serve(reader, writer)
+                except (BrokenPipeError, ConnectionResetError):
+                    logger.warning("客户端连接中断")
+    finally:
+        server.close()
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="常驻数字标签识别进程")
+    parser.add_argument("--socket", help="Unix socket 路径，不指定则使用 stdin/stdout")
+    parser.add_argument("--confidence", type=float, default=0.5)
+    parser.add_argument("--use-gpu", action="store_true")
+    parser.add_argument("--detect-max-side", type=int, help="大图检测时缩小到的最大边长")
+    parser.add_argument("--yolo-backend", choices=["torch", "onnx"], default="torch", help="YOLO推理后端")
+    parser.add_argument("--int8", action="store_true", help="onnx 后端使用 int8 量化模型")
+    parser.add_argument("--ocr-backend", choices=["easyocr", "digits"], default="easyocr", help="数字识别后端")
+    parser.add_argument("--precision", choices=["fp32", "int8"], help="识别网络精度（int8: CPU 上动态量化并缓存）")
+    parser.add_argument("--recognizer-only", action="store_true", help="跳过 EasyOCR 文本检测，ROI 只按数字识别")
+    parser.add_argument("--lexicon", help="编号词典来源: mysql（商品表 code 列）或每行一个编号的文件路径")
+    parser.add_argument("--threads", type=int, help="线程预算（torch / OpenCV / OMP），同一主机运行多个实例时避免超额订阅")
+    parser.add_argument("--shm", help="共享内存环形缓冲区文件路径（如 /dev/shm/recognizer.ring）")
+    args = parser.parse_args()
+
+    # stdout 专用于协议帧，模型加载/下载时的输出统一改写到 stderr
+    protocol_out = sys.stdout.buffer
+    sys.stdout = sys.stderr
+
+    if args.threads:
+        apply_thread_budget(args.threads)
+
+    daemon = RecognizerDaemon(
+        confidence=args.confidence,
+        use_gpu=args.use_gpu,
+        detector_options={
+            "detect_max_side": args.detect_max_side,
+            "backend": args.yolo_backend,
+            "int8": args.int8,
+        },
+        ocr_options={
+            "recognizer_only": args.recognizer_only,
+            "backend": args.ocr_backend,
+            "precision": args.precision,
+            "lexicon": {"source": args.lexicon} if args.lexicon else None,
+        },
+        shm_path=args.shm
+    )
+
+    if args.socket:
+        serve_unix_socket(daemon, args.socket)
+    else:
+        daemon.serve(sys.stdin.buffer, protocol_out)
+
+
+if __name__ == "__main__":
+    main()
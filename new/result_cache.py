@@ -0,0 +1,77 @@
+"""
+识别结果缓存 - 相同图像重复上传时直接返回结果
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Optional, Dict, Any
+
+
+class ResultCache:
+    """
+    按内容寻址的 LRU 识别结果缓存
+    键为图像内容哈希 + 识别选项，值为流水线识别结果
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        """
+        Args:
+            max_entries: 最多缓存的结果数，0 表示禁用缓存
+        """
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    @staticmethod
+    def make_key(contents: bytes, **options) -> str:
+        """由图像内容和识别选项生成缓存键"""
+        digest = hashlib.blake2b(contents, digest_size=16).hexdigest()
+        suffix = ",".join(f"{k}={options[k]}" for k in sorted(options))
+        return f"{digest}:{suffix}"
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """查询缓存，命中时返回结果副本"""
+        if not self.enabled:
+            return None
+
+        with self._lock:
+            result = self._entries.get(key)
+            if result is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return dict(result)
+
+    def put(self, key: str, result: Dict[str, Any]):
+        """写入缓存，超出容量时淘汰最久未使用的结果"""
+        if not self.enabled:
+            return
+
+        with self._lock:
+            self._entries[key] = dict(result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存统计信息"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0
+            }
@@ -0,0 +1,140 @@
+"""
+共享内存帧环形缓冲区 - 识别进程与调用方之间交换图像和结果
+
+文件位于 /dev/shm（tmpfs），双方映射同一文件，控制消息仍走 stdin/stdout 帧，
+图像与结果只写入槽位，不经过管道，也不落盘。原始像素帧在识别进程中以
+零拷贝视图直接使用。
+
+布局（小端）:
+    全局头 64 字节: magic "OCRRING1" | version u32 | slot_count u32 | slot_size u32
+    槽位 i 位于 64 + i * (32 + slot_size):
+        槽位头 32 字节: state | format | width | height | channels | payload_len | result_len | reserved（均为 u32）
+        数据区 slot_size 字节：请求时存放图像，完成后存放 JSON 结果
+"""
+import mmap
+import os
+import struct
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+import cv2
+
+MAGIC = b"OCRRING1"
+VERSION = 1
+
+RING_HEADER = struct.Struct("<8sIII44x")
+SLOT_HEADER = struct.Struct("<8I")
+
+# 槽位状态
+SLOT_FREE = 0
+SLOT_REQUEST = 1
+SLOT_DONE = 2
+
+# 图像格式: 编码图像（JPEG/PNG 等）/ 原始 BGR 像素 / 原始灰度像素
+FORMAT_ENCODED = 0
+FORMAT_RAW_BGR = 1
+FORMAT_RAW_GRAY = 2
+
+
+class ShmRing:
+    """映射到 /dev/shm 文件的固定槽位环形缓冲区"""
+
+    def __init__(self, path: str):
+        """打开已存在的缓冲区文件（由调用方创建并写好全局头）"""
+        self.path = path
+        self._fd = os.open(path, os.O_RDWR)
+        try:
+            self._mm = mmap.mmap(self._fd, 0)
+        finally:
+            os.close(self._fd)
+
+        magic, version, self.slot_count, self.slot_size = RING_HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != VERSION:
+            self._mm.close()
+            raise ValueError(f"无效的共享内存缓冲区: {path}")
+
+        expected = RING_HEADER.size + self.slot_count * (SLOT_HEADER.size + self.slot_size)
+        if len(self._mm) < expected:
+            self._mm.close()
+            raise ValueError(f"共享内存缓冲区大小不足: {len(self._mm)} < {expected}")
+
+    @classmethod
+    def create(cls, path: str, slot_count: int = 4, slot_size: int = 16 * 1024 * 1024) -> "ShmRing":
+        """创建并初始化缓冲区文件"""
+        size = RING_HEADER.size + slot_count * (SLOT_HEADER.size + slot_size)
+        fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o600)
+        try:
+            os.ftruncate(fd, size)
+            os.pwrite(fd, RING_HEADER.pack(MAGIC, VERSION, slot_count, slot_size), 0)
+        finally:
+            os.close(fd)
+        return cls(path)
+
+    def _slot_offset(self, slot: int) -> int:
+        if not 0 <= slot < self.slot_count:
+            raise ValueError(f"槽位越界: {slot}")
+        return RING_HEADER.size + slot * (SLOT_HEADER.size + self.slot_size)
+
+    def read_header(self, slot: int) -> Dict[str, int]:
+        fields = SLOT_HEADER.unpack_from(self._mm, self._slot_offset(slot))
+        keys = ("state", "format", "width", "height", "channels", "payload_len", "result_len")
+        return dict(zip(keys, fields))
+
+    def _write_header(self, slot: int, state: int, fmt: int = 0, width: int = 0, height: int = 0,
+                      channels: int = 0, payload_len: int = 0, result_len: int = 0):
+        SLOT_HEADER.pack_into(self._mm, self._slot_offset(slot), state, fmt, width, height,
+                              channels, payload_len, result_len, 0)
+
+    def _data(self, slot: int, length: int) -> memoryview:
+        if length > self.slot_size:
+            raise ValueError(f"数据超出槽位容量: {length} > {self.slot_size}")
+        start = self._slot_offset(slot) + SLOT_HEADER.size
+        return memoryview(self._mm)[start:start + length]
+
+    def write_request(self, slot: int, data: bytes, fmt: int = FORMAT_ENCODED,
+                      width: int = 0, height: int = 0, channels: int = 0):
+        """写入请求图像（调用方使用）"""
+        self._data(slot, len(data))[:] = data
+        self._write_header(slot, SLOT_REQUEST, fmt, width, height, channels, payload_len=len(data))
+
+    def read_image(self, slot: int) -> Tuple[Optional[np.ndarray], Dict[str, int]]:
+        """
+        读取槽位中的图像
+
+        原始像素帧返回指向共享内存的零拷贝视图，槽位释放前有效；
+        编码图像在此解码，无法解码时返回 None
+        """
+        header = self.read_header(slot)
+        if header["state"] != SLOT_REQUEST:
+            raise ValueError(f"槽位 {slot} 没有待处理的请求")
+
+        data = self._data(slot, header["payload_len"])
+        fmt = header["format"]
+        if fmt == FORMAT_ENCODED:
+            return cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR), header
+
+        channels = 3 if fmt == FORMAT_RAW_BGR else 1
+        shape = (header["height"], header["width"], channels) if channels == 3 else (header["height"], header["width"])
+        if header["height"] * header["width"] * channels != header["payload_len"]:
+            raise ValueError(f"槽位 {slot} 的尺寸与数据长度不符")
+        return np.frombuffer(data, np.uint8).reshape(shape), header
+
+    def write_result(self, slot: int, result: bytes):
+        """将结果写回同一槽位（覆盖请求图像）"""
+        self._data(slot, len(result))[:] = result
+        self._write_header(slot, SLOT_DONE, result_len=len(result))
+
+    def read_result(self, slot: int) -> bytes:
+        """读取结果并释放槽位（调用方使用）"""
+        header = self.read_header(slot)
+        if header["state"] != SLOT_DONE:
+            raise ValueError(f"槽位 {slot} 没有结果")
+        result = bytes(self._data(slot, header["result_len"]))
+        self._write_header(slot, SLOT_FREE)
+        return result
+
+    def close(self):
+        self._mm.close()
+
+    def get_info(self) -> Dict[str, Any]:
+        return {"path": self.path, "slot_count": self.slot_count, "slot_size": self.slot_size}
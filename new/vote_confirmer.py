@@ -2,7 +2,8 @@
 多帧投票确认器 - 消除误识别
 """
 import time
-from collections import deque
+import threading
+from collections import deque, OrderedDict
 from typing import Optional, Dict, Any
 from dataclasses import dataclass
 from loguru import logger
@@ -157,3 +158,90 @@ class VoteConfirmer:
             "last_confirmed": self.last_confirmed_code,
             "last_confirmed_time": self.last_confirmed_time
         }
+
+
+class VoteRegistry:
+    """
+    按会话隔离的投票确认器注册表
+    每个摄像头/客户端使用独立的滑动窗口，按 LRU 与空闲超时淘汰，会话总数有硬上限
+    """
+    
+    def __init__(
+        self,
+        max_sessions: int = 1000,
+        idle_ttl: float = 300.0,
+        window_size: int = 5,
+        threshold: float = 0.6,
+        debounce_time: float = 1.0
+    ):
+        """
+        Args:
+            max_sessions: 最多同时保留的会话数，超出时淘汰最久未使用的会话
+            idle_ttl: 会话空闲超时（秒）
+            window_size / threshold / debounce_time: 新建确认器的参数
+        """
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.window_size = window_size
+        self.threshold = threshold
+        self.debounce_time = debounce_time
+        
+        # session_id -> (确认器, 最近访问时间)，按访问顺序排列
+        self._sessions: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.evicted = 0
+    
+    def get(self, session_id: str) -> VoteConfirmer:
+        """获取会话的确认器，不存在时创建"""
+        now = time.time()
+        with self._lock:
+            self._evict_expired(now)
+            
+            entry = self._sessions.get(session_id)
+            if entry is not None:
+                confirmer = entry[0]
+                self._sessions.move_to_end(session_id)
+            else:
+                confirmer = VoteConfirmer(
+                    window_size=self.window_size,
+                    threshold=self.threshold,
+                    debounce_time=self.debounce_time
+                )
+                while len(self._sessions) >= self.max_sessions:
+                    self._sessions.popitem(last=False)
+                    self.evicted += 1
+            
+            self._sessions[session_id] = (confirmer, now)
+            return confirmer
+    
+    def peek(self, session_id: str) -> Optional[VoteConfirmer]:
+        """获取已存在会话的确认器，不更新访问时间"""
+        with self._lock:
+            self._evict_expired(time.time())
+            entry = self._sessions.get(session_id)
+            return entry[0] if entry is not None else None
+    
+    def remove(self, session_id: str) -> bool:
+        """删除会话，返回会话是否存在"""
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+    
+    def _evict_expired(self, now: float):
+        """淘汰空闲超时的会话（OrderedDict 头部即最久未访问）"""
+        while self._sessions:
+            session_id, (_, last_access) = next(iter(self._sessions.items()))
+            if now - last_access < self.idle_ttl:
+                break
+            self._sessions.popitem(last=False)
+            self.evicted += 1
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """获取注册表统计信息"""
+        with self._lock:
+            self._evict_expired(time.time())
+            return {
+                "sessions": len(self._sessions),
+                "max_sessions": self.max_sessions,
+                "idle_ttl": self.idle_ttl,
+                "evicted": self.evicted
+            }